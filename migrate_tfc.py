@@ -5,7 +5,7 @@ import shutil
 import subprocess
 import sys
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterator, List, Optional, Tuple
 
 import requests
 
@@ -13,10 +13,13 @@ import requests
 DEFAULT_HOSTNAME = "app.terraform.io"
 DEFAULT_TARGET_DIRECTORIES = ["."]
 
-# Regex for targeted HCL replacement
-REMOTE_BACKEND_RE = re.compile(
-    r'(terraform\s+\{.*?)backend\s+"remote"\s+\{(?P<backend_content>.*?)\}(.*?\})',
-    re.MULTILINE | re.DOTALL,
+# Lexical landmarks for the linear-time remote backend locator
+_TOP_LEVEL_RE = re.compile(r'[{"#/<]|(?<![\w.-])terraform(?=\s*\{)')
+_BLOCK_SPECIAL_RE = re.compile(r'[{}"#/<]')
+_STRING_SPECIAL_RE = re.compile(r'["\\]|[$%]\{')
+_HEREDOC_RE = re.compile(r'<<-?([A-Za-z_][\w-]*)[ \t]*\r?\n')
+_TERRAFORM_BODY_RE = re.compile(
+    r'[{}"#/<]|(?<![\w.-])backend[ \t]+(?:"remote"|remote)\s*\{'
 )
 
 
@@ -160,6 +163,185 @@ def discover_tf_files(directory: str) -> List[str]:
     return sorted(tf_files)
 
 
+def _skip_line(text: str, i: int) -> int:
+    """Index just past the end of the line containing `i`."""
+    j = text.find("\n", i)
+    return len(text) if j < 0 else j + 1
+
+
+def _skip_comment_or_heredoc(text: str, i: int) -> int:
+    """
+    If a comment or heredoc starts at `i`, return the index just past it;
+    otherwise return i + 1 (the character at `i` is ordinary).
+    """
+    c = text[i]
+    if c == "#" or text.startswith("//", i):
+        return _skip_line(text, i)
+    if text.startswith("/*", i):
+        j = text.find("*/", i + 2)
+        if j < 0:
+            raise ValueError("unterminated block comment")
+        return j + 2
+    if c == "<":
+        m = _HEREDOC_RE.match(text, i)
+        if m:
+            end = re.compile(
+                r"^[ \t]*" + re.escape(m.group(1)) + r"[ \t]*\r?$", re.MULTILINE
+            ).search(text, m.end())
+            if not end:
+                raise ValueError(f"unterminated heredoc {m.group(1)}")
+            return _skip_line(text, end.end())
+    return i + 1
+
+
+def _skip_string(text: str, i: int) -> int:
+    """`i` is at an opening quote; return the index just past the closing one."""
+    pos = i + 1
+    while True:
+        m = _STRING_SPECIAL_RE.search(text, pos)
+        if not m:
+            raise ValueError("unterminated string")
+        token = m.group()
+        if token == '"':
+            return m.end()
+        if token == "\\":
+            pos = m.end() + 1
+        else:
+            # ${...} / %{...} template: may contain nested strings and braces
+            pos = _match_brace(text, m.end() - 1)
+
+
+def _match_brace(text: str, i: int) -> int:
+    """
+    `i` is at an opening "{"; return the index just past its matching "}".
+    Braces inside strings, templates, comments and heredocs are ignored.
+    Raises ValueError if the braces are unbalanced.
+    """
+    depth = 0
+    pos = i
+    while True:
+        m = _BLOCK_SPECIAL_RE.search(text, pos)
+        if not m:
+            raise ValueError("unbalanced braces")
+        c = m.group()
+        start = m.start()
+        if c == "{":
+            depth += 1
+            pos = start + 1
+        elif c == "}":
+            depth -= 1
+            pos = start + 1
+            if depth == 0:
+                return pos
+        elif c == '"':
+            pos = _skip_string(text, start)
+        else:
+            pos = _skip_comment_or_heredoc(text, start)
+
+
+def iter_terraform_blocks(
+    text: str, stop: Optional[int] = None
+) -> Iterator[Tuple[int, int]]:
+    """
+    Yield (start, end) offsets of every top-level `terraform { ... }` block,
+    optionally only those starting at or before offset `stop`.
+    Other top-level blocks are skipped wholesale by brace matching, so the
+    cost is one linear pass regardless of how many resources the file holds.
+    """
+    pos = 0
+    while True:
+        m = _TOP_LEVEL_RE.search(text, pos)
+        if not m or (stop is not None and m.start() > stop):
+            return
+        c = m.group()
+        start = m.start()
+        if c == "terraform":
+            end = _match_brace(text, text.index("{", m.end()))
+            yield start, end
+            pos = end
+        elif c == "{":
+            pos = _match_brace(text, start)
+        elif c == '"':
+            pos = _skip_string(text, start)
+        else:
+            pos = _skip_comment_or_heredoc(text, start)
+
+
+class RemoteBackendBlock:
+    """
+    Offsets of a `backend "remote" { ... }` block and its enclosing
+    `terraform` block. `start`/`end` span the whole backend block, from the
+    `backend` keyword through its closing brace; `body_start`/`body_end` span
+    the text between its braces. All ends are exclusive.
+    """
+
+    __slots__ = (
+        "start",
+        "end",
+        "body_start",
+        "body_end",
+        "terraform_start",
+        "terraform_end",
+    )
+
+    def __init__(
+        self,
+        start: int,
+        end: int,
+        body_start: int,
+        body_end: int,
+        terraform_start: int,
+        terraform_end: int,
+    ):
+        self.start = start
+        self.end = end
+        self.body_start = body_start
+        self.body_end = body_end
+        self.terraform_start = terraform_start
+        self.terraform_end = terraform_end
+
+    def __repr__(self) -> str:
+        return f"RemoteBackendBlock(start={self.start}, end={self.end})"
+
+
+def locate_remote_backend(text: str) -> Optional[RemoteBackendBlock]:
+    """
+    Locate the first `backend "remote"` block declared directly inside a
+    top-level `terraform` block. Runs in one linear pass with no
+    backtracking, ignores strings, comments and heredocs, and handles nested
+    blocks such as `workspaces {}`.
+
+    Offsets index into `text`. To get byte offsets, pass file bytes decoded
+    as latin-1: every HCL delimiter is ASCII, so the mapping is 1:1.
+    Returns None if there is no remote backend. Raises ValueError if braces,
+    strings or heredocs are unterminated.
+    """
+    # No terraform block starting after the last `backend` token can hold one
+    last = text.rfind("backend")
+    if last < 0:
+        return None
+    for tf_start, tf_end in iter_terraform_blocks(text, stop=last):
+        pos = text.index("{", tf_start) + 1
+        while True:
+            m = _TERRAFORM_BODY_RE.search(text, pos, tf_end)
+            if not m or m.group() == "}":
+                break
+            c = m.group()
+            start = m.start()
+            if c.startswith("backend"):
+                end = _match_brace(text, m.end() - 1)
+                return RemoteBackendBlock(
+                    start, end, m.end(), end - 1, tf_start, tf_end
+                )
+            if c == "{":
+                pos = _match_brace(text, start)
+            elif c == '"':
+                pos = _skip_string(text, start)
+            else:
+                pos = _skip_comment_or_heredoc(text, start)
+    return None
+
+
 def migrate_directory(
     folder: str,
     token: Optional[str],
@@ -188,9 +370,13 @@ def migrate_directory(
         except (OSError, PermissionError) as e:
             print(f"  └─ Warning: Could not read {filename}: {e}")
             continue
-        match = REMOTE_BACKEND_RE.search(content)
+        try:
+            block = locate_remote_backend(content)
+        except ValueError as e:
+            print(f"  └─ Warning: Could not scan {filename}: {e}")
+            continue
 
-        if not match:
+        if block is None:
             continue
 
         files_with_backends.append(filename)
@@ -207,8 +393,8 @@ def migrate_directory(
         with open(path, "r", encoding="utf-8") as f:
             content = f.read()
 
-        match = REMOTE_BACKEND_RE.search(content)
-        ws_info = match.group("backend_content")
+        block = locate_remote_backend(content)
+        ws_info = content[block.body_start:block.body_end]
 
         # Match patterns but exclude commented lines (lines starting with optional whitespace + #)
         # Note: This regex won't catch inline comments like: organization = "foo" # comment
@@ -242,7 +428,7 @@ def migrate_directory(
             f'cloud {{\n{host_line}    organization = "{org}"\n'
             f"    workspaces {{\n      {ws_config}\n    }}\n  }}"
         )
-        new_content = REMOTE_BACKEND_RE.sub(rf"\1{cloud_block}", content)
+        new_content = content[:block.start] + cloud_block + content[block.end:]
 
         if dry_run:
             tag_msg = f" and add tag to '{ws_name_api}'" if ws_name_api else ""
@@ -0,0 +1,151 @@
+"""
+Load-test the migrator's TFC API path against the local mock server.
+
+Starts mock_tfc.py in-process with --workspaces workspaces and tags every one
+of them through the migrator's own client, in three modes:
+
+  ensure    ensure_tfc_tag() per workspace: GET show + POST tags
+  indexed   ensure_tfc_tag() with a prefetched WorkspaceIndex (paginated list)
+  batch     TagBatch: prefetched index + bulk tag relationship calls
+
+For each mode it reports wall time, workspaces per second, and how many
+requests the client made, retried and saw throttled.
+
+Usage:
+    python3 benchmarks/bench_api.py --workspaces 10000 -j 16
+    python3 benchmarks/bench_api.py --latency 0.05 --throttle 0.02 --rate-limit 30
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from migrate_tfc import (  # noqa: E402
+    RequestScheduler,
+    TagBatch,
+    TfcClient,
+    WorkspaceIndex,
+    ensure_tfc_tag,
+)
+from mock_tfc import start_mock_server  # noqa: E402
+
+MODES = ("ensure", "indexed", "batch")
+
+
+def run_mode(mode: str, server, names, jobs: int, api_rate: float) -> dict:
+    client = TfcClient(
+        server.hostname,
+        "mock-token",
+        pool_size=jobs,
+        scheduler=RequestScheduler(api_rate, max_concurrency=jobs),
+        scheme="http",
+    )
+    org = server.state.org
+    tag = f"bench-{mode}"
+    failures = 0
+    start = time.perf_counter()
+    # The client logs every call; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == "batch":
+            batch = TagBatch(client, WorkspaceIndex(client))
+            for name in names:
+                batch.add(org, name, tag)
+            failures = batch.apply(jobs=jobs)
+        else:
+            index = WorkspaceIndex(client) if mode == "indexed" else None
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                results = pool.map(
+                    lambda name: ensure_tfc_tag(client, org, name, tag, index), names
+                )
+                failures = sum(1 for ok in results if not ok)
+    elapsed = time.perf_counter() - start
+    client.close()
+    sched = client.scheduler
+    return {
+        "mode": mode,
+        "workspaces": len(names),
+        "seconds": elapsed,
+        "per_second": len(names) / elapsed if elapsed else 0.0,
+        "failures": failures,
+        "requests": sched.requests,
+        "retries": sched.retries,
+        "throttled": sched.throttled,
+        "final_concurrency": sched.limit,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workspaces", type=int, default=2000, help="Workspaces to tag")
+    parser.add_argument("-j", "--jobs", type=int, default=8, help="Client concurrency")
+    parser.add_argument(
+        "--api-rate",
+        type=float,
+        default=1000.0,
+        help="Client-side --api-rate (default: 1000, effectively unlimited)",
+    )
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock server latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Mock server latency jitter (s)")
+    parser.add_argument("--throttle", type=float, default=0.0, help="Probability of a random 429")
+    parser.add_argument(
+        "--rate-limit", type=float, default=0.0, help="Mock server requests per second (0 disables)"
+    )
+    parser.add_argument(
+        "--retry-after", type=float, default=0.2, help="Retry-After for random 429s (s)"
+    )
+    parser.add_argument(
+        "--modes", default=",".join(MODES), help=f"Comma-separated subset of {', '.join(MODES)}"
+    )
+    parser.add_argument("--json", metavar="PATH", help="Also write results as JSON")
+    args = parser.parse_args()
+
+    modes = args.modes.split(",")
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(sorted(unknown))}")
+
+    results = []
+    print(
+        f"{'mode':<8} {'seconds':>9} {'ws/s':>9} {'requests':>9} {'retried':>8} "
+        f"{'429s':>6} {'failed':>7}"
+    )
+    for mode in modes:
+        # A fresh server per mode so earlier tags don't short-circuit later ones
+        server = start_mock_server(
+            workspaces=args.workspaces,
+            latency=args.latency,
+            jitter=args.jitter,
+            throttle=args.throttle,
+            rate_limit=args.rate_limit,
+            retry_after=args.retry_after,
+            seed=0,
+        )
+        try:
+            names = list(server.state.workspaces)
+            result = run_mode(mode, server, names, args.jobs, args.api_rate)
+            result["server_responses"] = dict(server.stats)
+        finally:
+            server.shutdown()
+            server.server_close()
+        results.append(result)
+        print(
+            f"{mode:<8} {result['seconds']:9.2f} {result['per_second']:9.1f} "
+            f"{result['requests']:>9} {result['retries']:>8} {result['throttled']:>6} "
+            f"{result['failures']:>7}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "api", "args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
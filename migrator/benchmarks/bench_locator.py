@@ -0,0 +1,172 @@
+"""
+Benchmark locate_remote_backend() against the legacy REMOTE_BACKEND_RE regex.
+
+Generates synthetic .tf inputs from 1 KB to 50 MB and reports seconds per MB
+for each locator, so linear scaling shows up as a flat column. Three shapes
+are measured:
+
+  backend-first   terraform/backend block at the top, then N resources
+  no-backend      terraform block without a backend, then N resources
+  adversarial     many `terraform {` lines inside comments, no backend block
+
+The last two end with a comment mentioning `backend "remote"`, so neither
+locator can return early without scanning. Both absolute seconds and
+seconds per MB are reported. The legacy regex is skipped for a size once
+its quadratic extrapolation from the previous size exceeds --regex-budget
+seconds, or after a run that actually did.
+
+Usage:
+    python3 benchmarks/bench_locator.py
+    python3 benchmarks/bench_locator.py --max-size 5MB --json results.json
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from typing import Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrate_tfc import locate_remote_backend  # noqa: E402
+
+# The regex the locator replaced, kept here only as a baseline
+LEGACY_REMOTE_BACKEND_RE = re.compile(
+    r'(terraform\s+\{.*?)backend\s+"remote"\s+\{(?P<backend_content>.*?)\}(.*?\})',
+    re.MULTILINE | re.DOTALL,
+)
+
+SIZES = ["1KB", "10KB", "100KB", "1MB", "10MB", "50MB"]
+
+HEADER_WITH_BACKEND = '''terraform {
+  required_version = ">= 1.4.0"
+  backend "remote" {
+    organization = "bench"
+    workspaces {
+      prefix = "bench-"
+    }
+  }
+}
+'''
+HEADER_WITHOUT_BACKEND = '''terraform {
+  required_version = ">= 1.4.0"
+}
+'''
+RESOURCE = '''resource "null_resource" "r{i}" {{
+  triggers = {{
+    id   = "${{var.prefix}}-{i}"
+    tags = jsonencode({{ a = "{{", b = "}}" }})
+  }}
+}}
+'''
+ADVERSARIAL_LINE = "# terraform {{ {i} }}\n"
+# A trailing mention keeps cheap "no backend token" short-circuits honest
+BACKEND_MENTION_FOOTER = '# backend "remote" was removed\n'
+
+
+def parse_size(value: str) -> int:
+    units = {"KB": 1024, "MB": 1024 ** 2}
+    for suffix, factor in units.items():
+        if value.upper().endswith(suffix):
+            return int(float(value[: -len(suffix)]) * factor)
+    return int(value)
+
+
+def generate(shape: str, size: int) -> str:
+    """Build a synthetic .tf file of roughly `size` characters."""
+    if shape == "backend-first":
+        header, template = HEADER_WITH_BACKEND, RESOURCE
+    elif shape == "no-backend":
+        header, template = HEADER_WITHOUT_BACKEND, RESOURCE
+    else:
+        header, template = HEADER_WITHOUT_BACKEND, ADVERSARIAL_LINE
+    parts = [header]
+    total = len(header)
+    i = 0
+    while total < size:
+        chunk = template.format(i=i)
+        parts.append(chunk)
+        total += len(chunk)
+        i += 1
+    if shape != "backend-first":
+        parts.append(BACKEND_MENTION_FOOTER)
+    return "".join(parts)
+
+
+def best_of(func, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-size", default="50MB", help="Largest input size")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement")
+    parser.add_argument(
+        "--regex-budget",
+        type=float,
+        default=10.0,
+        help=(
+            "Skip the legacy regex for a size expected (or, after a run, seen) "
+            "to take longer than this"
+        ),
+    )
+    parser.add_argument("--json", metavar="PATH", help="Also write results as JSON")
+    args = parser.parse_args()
+
+    max_size = parse_size(args.max_size)
+    results = []
+    print(
+        f"{'shape':<14} {'size':>6} {'locator s':>10} {'locator s/MB':>13} "
+        f"{'regex s':>10} {'regex s/MB':>12}"
+    )
+    for shape in ("backend-first", "no-backend", "adversarial"):
+        regex_enabled = True
+        last: Optional[Tuple[int, float]] = None
+        for label in SIZES:
+            size = parse_size(label)
+            if size > max_size:
+                break
+            text = generate(shape, size)
+            mb = len(text) / 1024 ** 2
+            locator = best_of(locate_remote_backend, text, args.repeat)
+            regex = None
+            if regex_enabled and last is not None:
+                # The lazy DOTALL regex is quadratic on the adversarial shape
+                last_size, last_seconds = last
+                expected = last_seconds * (len(text) / last_size) ** 2
+                regex_enabled = expected <= args.regex_budget
+            if regex_enabled:
+                regex = best_of(LEGACY_REMOTE_BACKEND_RE.search, text, 1)
+                regex_enabled = regex < args.regex_budget
+                last = (len(text), regex)
+            results.append(
+                {
+                    "shape": shape,
+                    "size": len(text),
+                    "locator_seconds": locator,
+                    "regex_seconds": regex,
+                }
+            )
+            regex_cols = (
+                f"{regex:10.4f} {regex / mb:12.4f}"
+                if regex is not None
+                else f"{'skipped':>10} {'skipped':>12}"
+            )
+            print(
+                f"{shape:<14} {label:>6} {locator:10.4f} {locator / mb:13.4f} "
+                f"{regex_cols}"
+            )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "locator", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
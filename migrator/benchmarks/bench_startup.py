@@ -0,0 +1,203 @@
+"""
+Measure migrate_tfc.py startup cost for the ways wrappers invoke it.
+
+Each scenario runs the script in a fresh interpreter --repeat times and
+reports the fastest and median wall time, which of the heavy optional
+modules (hcl2, lark, requests) were imported, and how many times
+`terraform` was spawned (through a counting stub on PATH):
+
+  import                 `import migrate_tfc` only
+  help                   `migrate_tfc.py --help`
+  dry_run_empty          dry run of a directory with no .tf files
+  dry_run_no_backend     dry run of a directory without a remote backend
+  dry_run_backend_cold   dry run of a remote backend, empty cache directory
+  dry_run_backend_warm   the same with the parse cache already populated
+  dry_run_backend_served the same run sent to a `--serve` daemon (--connect)
+
+A dry run should neither import requests nor spawn terraform, and only the
+cold run should need hcl2.
+
+Usage:
+    python3 benchmarks/bench_startup.py
+    python3 benchmarks/bench_startup.py --repeat 20 --json startup.json
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+MIGRATOR_DIR = os.path.dirname(BENCH_DIR)
+SCRIPT = os.path.join(MIGRATOR_DIR, "migrate_tfc.py")
+
+HEAVY_MODULES = ("hcl2", "lark", "requests")
+IMPORT_LINE_RE = re.compile(r"^import time:\s+\d+ \|\s+\d+ \|\s+(\S+)$")
+
+BACKEND = '''terraform {
+  backend "remote" {
+    organization = "bench-org"
+    workspaces {
+      prefix = "bench-"
+    }
+  }
+}
+'''
+NO_BACKEND = '''resource "null_resource" "r" {}
+'''
+# Appends a line to $STUB_LOG for every invocation
+STUB_TERRAFORM = '''#!/bin/sh
+echo "$@" >> "$STUB_LOG"
+if [ "$1" = "version" ]; then echo "Terraform v1.7.0"; fi
+exit 0
+'''
+
+
+def run_once(argv, env: dict, cwd: str):
+    """Run one interpreter; return (seconds, heavy modules imported)."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime"] + argv,
+        env=env,
+        cwd=cwd,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    imported = set()
+    for line in proc.stderr.splitlines():
+        m = IMPORT_LINE_RE.match(line)
+        if m and m.group(1).split(".")[0] in HEAVY_MODULES:
+            imported.add(m.group(1).split(".")[0])
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(argv)} exited {proc.returncode}")
+    return elapsed, sorted(imported)
+
+
+def start_daemon(socket_path: str, env: dict) -> subprocess.Popen:
+    """Start `migrate_tfc.py --serve` and wait until it accepts jobs."""
+    daemon = subprocess.Popen(
+        [sys.executable, SCRIPT, "--serve", socket_path],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while not os.path.exists(socket_path):
+        if daemon.poll() is not None or time.monotonic() > deadline:
+            daemon.kill()
+            raise RuntimeError("migrate_tfc.py --serve did not start")
+        time.sleep(0.05)
+    return daemon
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per scenario")
+    parser.add_argument("--json", metavar="PATH", help="Also write results as JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="tfc-startup-")
+    try:
+        dirs = {}
+        for name, content in (
+            ("empty", None),
+            ("no-backend", NO_BACKEND),
+            ("backend", BACKEND),
+        ):
+            dirs[name] = os.path.join(workdir, name)
+            os.makedirs(dirs[name])
+            if content:
+                with open(os.path.join(dirs[name], "main.tf"), "w", encoding="utf-8") as f:
+                    f.write(content)
+        bin_dir = os.path.join(workdir, "bin")
+        os.makedirs(bin_dir)
+        stub = os.path.join(bin_dir, "terraform")
+        with open(stub, "w", encoding="utf-8") as f:
+            f.write(STUB_TERRAFORM)
+        os.chmod(stub, 0o755)
+        stub_log = os.path.join(workdir, "terraform.log")
+
+        env = dict(os.environ)
+        env.pop("TFC_TOKEN", None)
+        env["PATH"] = bin_dir + os.pathsep + env["PATH"]
+        env["STUB_LOG"] = stub_log
+        cache_root = os.path.join(workdir, "cache")
+        socket_path = os.path.join(workdir, "migrator.sock")
+        daemon = None
+
+        scenarios = [
+            ("import", ["-c", "import migrate_tfc"], False),
+            ("help", [SCRIPT, "--help"], False),
+            ("dry_run_empty", [SCRIPT, "-d", dirs["empty"]], False),
+            ("dry_run_no_backend", [SCRIPT, "-d", dirs["no-backend"]], False),
+            ("dry_run_backend_cold", [SCRIPT, "-d", dirs["backend"]], True),
+            ("dry_run_backend_warm", [SCRIPT, "-d", dirs["backend"]], False),
+            (
+                "dry_run_backend_served",
+                [SCRIPT, "--connect", socket_path, "-d", dirs["backend"]],
+                False,
+            ),
+        ]
+        results = []
+        print(f"{'scenario':<22} {'min s':>8} {'median s':>9} {'terraform':>9}  imports")
+        for name, argv, cold in scenarios:
+            times = []
+            imported = set()
+            spawned = 0
+            if name == "dry_run_backend_served":
+                shared = dict(env, XDG_CACHE_HOME=os.path.join(cache_root, "shared"))
+                daemon = start_daemon(socket_path, shared)
+            if name == "dry_run_backend_warm":
+                # Populate the shared cache first so every timed run is warm
+                shared = dict(env, XDG_CACHE_HOME=os.path.join(cache_root, "shared"))
+                run_once(argv, shared, MIGRATOR_DIR)
+            for i in range(args.repeat):
+                run_env = dict(env)
+                if cold:
+                    # A fresh cache directory each time: no parse or grammar cache
+                    run_env["XDG_CACHE_HOME"] = os.path.join(cache_root, f"{name}-{i}")
+                else:
+                    run_env["XDG_CACHE_HOME"] = os.path.join(cache_root, "shared")
+                if os.path.exists(stub_log):
+                    os.remove(stub_log)
+                elapsed, modules = run_once(argv, run_env, MIGRATOR_DIR)
+                times.append(elapsed)
+                imported.update(modules)
+                if os.path.exists(stub_log):
+                    with open(stub_log, "r", encoding="utf-8") as f:
+                        spawned += len(f.readlines())
+            result = {
+                "scenario": name,
+                "min_seconds": min(times),
+                "median_seconds": statistics.median(times),
+                "terraform_spawns": spawned,
+                "heavy_imports": sorted(imported),
+            }
+            results.append(result)
+            print(
+                f"{name:<22} {result['min_seconds']:8.3f} {result['median_seconds']:9.3f} "
+                f"{spawned:>9}  {', '.join(result['heavy_imports']) or '-'}"
+            )
+    finally:
+        if daemon is not None:
+            daemon.terminate()
+            daemon.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {"benchmark": "startup", "repeat": args.repeat, "results": results},
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+Benchmark the migrator against a synthetic Terraform monorepo.
+
+Generates a tree of N stacks x M files x K resources under a temporary
+directory and times each part of a run:
+
+  discover_tf_files      listing .tf files in every stack
+  discover_root_modules  walking the tree for remote backends (-r)
+  locate_remote_backend  finding the backend block in each backend file
+  parse_remote_backend   HCL2 parsing of each backend file
+  regex_fallback         the regex path used when HCL2 parsing fails
+  parse_process_pool     parse_remote_backend via a ParsePool of --parse-workers
+                         processes, fed from --jobs threads (only with --parse-workers)
+  dry_run_cold           end-to-end `migrate_tfc.py -r ROOT` with an empty cache
+  dry_run_warm           the same run again with the parse cache populated
+
+`terraform` is replaced by a stub on PATH that succeeds instantly, and no
+token is passed, so the dry runs make no TFC API calls. Stacks use a mix of
+`name`/`prefix` workspaces (--prefix-ratio) and `#`, `//` and `/* */`
+comments, and some carry a `modules/` directory the walk must prune.
+
+Usage:
+    python3 benchmarks/bench_suite.py
+    python3 benchmarks/bench_suite.py --stacks 2000 --files 5 --resources 20 -j 8
+    python3 benchmarks/bench_suite.py --json results.json --keep /tmp/monorepo
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+MIGRATOR_DIR = os.path.dirname(BENCH_DIR)
+SCRIPT = os.path.join(MIGRATOR_DIR, "migrate_tfc.py")
+sys.path.insert(0, MIGRATOR_DIR)
+
+from migrate_tfc import (  # noqa: E402
+    ParsePool,
+    discover_root_modules,
+    discover_tf_files,
+    locate_remote_backend,
+    parse_backend_regex,
+    parse_remote_backend,
+)
+
+COMMENT_STYLES = {
+    "hash": "# {text}",
+    "slash": "// {text}",
+    "block": "/* {text} */",
+}
+
+BACKEND = '''{comment}
+terraform {{
+  required_version = ">= 1.4.0"
+  {comment}
+  backend "remote" {{
+    organization = "bench-org"
+    workspaces {{
+      {workspace}
+    }}
+  }}
+}}
+'''
+RESOURCE = '''{comment}
+resource "null_resource" "r{i}" {{
+  triggers = {{
+    id   = "${{var.prefix}}-{i}"
+    tags = jsonencode({{ stack = "{stack}", index = {i} }})
+  }}
+}}
+'''
+MODULE = '''terraform {
+  required_providers {
+    null = { source = "hashicorp/null" }
+  }
+}
+'''
+STUB_TERRAFORM = '''#!/bin/sh
+if [ "$1" = "version" ]; then echo "Terraform v1.7.0"; fi
+exit 0
+'''
+
+
+def generate_tree(
+    root: str,
+    stacks: int,
+    files: int,
+    resources: int,
+    prefix_ratio: float,
+    styles,
+    seed: int,
+) -> int:
+    """
+    Write `stacks` root modules under `root`, each with a backend.tf and
+    `files - 1` further files sharing `resources` resources. Returns the
+    number of bytes written.
+    """
+    rng = random.Random(seed)
+    written = 0
+    for s in range(stacks):
+        stack = f"stack-{s:05d}"
+        stack_dir = os.path.join(root, f"team-{s % 20:02d}", stack)
+        os.makedirs(stack_dir)
+        style = COMMENT_STYLES[rng.choice(styles)]
+        if rng.random() < prefix_ratio:
+            workspace = f'prefix = "{stack}-"'
+        else:
+            workspace = f'name = "{stack}"'
+        contents = {
+            "backend.tf": BACKEND.format(
+                comment=style.format(text=f"managed by {stack}"), workspace=workspace
+            )
+        }
+        per_file = [[] for _ in range(max(files - 1, 1))]
+        for i in range(resources):
+            per_file[i % len(per_file)].append(
+                RESOURCE.format(
+                    comment=style.format(text=f"resource {i}"), i=i, stack=stack
+                )
+            )
+        for n, chunk in enumerate(per_file[: files - 1]):
+            contents[f"main{n}.tf"] = "".join(chunk)
+        if s % 10 == 0:
+            module_dir = os.path.join(stack_dir, "modules", "network")
+            os.makedirs(module_dir)
+            contents[os.path.join("modules", "network", "main.tf")] = MODULE
+        for name, text in contents.items():
+            with open(os.path.join(stack_dir, name), "w", encoding="utf-8") as f:
+                written += f.write(text)
+    return written
+
+
+def stub_terraform(directory: str) -> str:
+    """Write a no-op `terraform` executable into `directory`."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "terraform")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(STUB_TERRAFORM)
+    os.chmod(path, 0o755)
+    return directory
+
+
+def best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def dry_run(root: str, env: dict, jobs: int, parse_workers: int) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [
+            sys.executable,
+            SCRIPT,
+            "-r",
+            root,
+            "-j",
+            str(jobs),
+            "--parse-workers",
+            str(parse_workers),
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    return time.perf_counter() - start
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=MIGRATOR_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stacks", type=int, default=500, help="Root modules to generate")
+    parser.add_argument("--files", type=int, default=4, help=".tf files per stack")
+    parser.add_argument("--resources", type=int, default=25, help="Resources per stack")
+    parser.add_argument(
+        "--prefix-ratio",
+        type=float,
+        default=0.5,
+        help="Fraction of stacks using `prefix` instead of `name` workspaces",
+    )
+    parser.add_argument(
+        "--comment-styles",
+        default=",".join(COMMENT_STYLES),
+        help=f"Comma-separated mix of {', '.join(COMMENT_STYLES)}",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the tree")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="--jobs for the dry runs")
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=0,
+        help="--parse-workers for the dry runs, and size of the measured ParsePool",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per in-process measurement")
+    parser.add_argument("--keep", metavar="DIR", help="Generate the tree here and keep it")
+    parser.add_argument("--json", metavar="PATH", help="Also write results as JSON")
+    args = parser.parse_args()
+
+    styles = args.comment_styles.split(",")
+    unknown = set(styles) - set(COMMENT_STYLES)
+    if unknown:
+        parser.error(f"unknown comment style(s): {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix="tfc-bench-")
+    root = os.path.abspath(args.keep) if args.keep else os.path.join(workdir, "monorepo")
+    try:
+        if os.path.exists(root):
+            shutil.rmtree(root)
+        os.makedirs(root)
+        size = generate_tree(
+            root,
+            args.stacks,
+            args.files,
+            args.resources,
+            args.prefix_ratio,
+            styles,
+            args.seed,
+        )
+
+        stacks = sorted(discover_root_modules(root))
+        backend_texts = []
+        for stack in stacks:
+            with open(os.path.join(stack, "backend.tf"), "r", encoding="utf-8") as f:
+                backend_texts.append(f.read())
+        bodies = []
+        for text in backend_texts:
+            block = locate_remote_backend(text)
+            bodies.append(text[block.body_start:block.body_end])
+
+        timings = {
+            "discover_tf_files": best_of(
+                lambda: [discover_tf_files(stack) for stack in stacks], args.repeat
+            ),
+            "discover_root_modules": best_of(
+                lambda: list(discover_root_modules(root)), args.repeat
+            ),
+            "locate_remote_backend": best_of(
+                lambda: [locate_remote_backend(text) for text in backend_texts],
+                args.repeat,
+            ),
+            "parse_remote_backend": best_of(
+                lambda: [parse_remote_backend(text) for text in backend_texts],
+                args.repeat,
+            ),
+            "regex_fallback": best_of(
+                lambda: [parse_backend_regex(body) for body in bodies], args.repeat
+            ),
+        }
+        if args.parse_workers:
+            pool = ParsePool(args.parse_workers)
+            try:
+                callers = max(args.jobs, args.parse_workers)
+                with ThreadPoolExecutor(max_workers=callers) as threads:
+                    # Warm every worker before timing
+                    list(threads.map(pool.parse, backend_texts[: args.parse_workers]))
+                    timings["parse_process_pool"] = best_of(
+                        lambda: list(threads.map(pool.parse, backend_texts)), args.repeat
+                    )
+            finally:
+                pool.close()
+
+        env = dict(os.environ)
+        env.pop("TFC_TOKEN", None)
+        env["PATH"] = stub_terraform(os.path.join(workdir, "bin")) + os.pathsep + env["PATH"]
+        env["XDG_CACHE_HOME"] = os.path.join(workdir, "cache")
+        timings["dry_run_cold"] = dry_run(root, env, args.jobs, args.parse_workers)
+        timings["dry_run_warm"] = dry_run(root, env, args.jobs, args.parse_workers)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(
+        f"{args.stacks} stacks x {args.files} files x {args.resources} resources "
+        f"({size / 1024 ** 2:.1f} MB, {len(stacks)} root modules found)"
+    )
+    print(f"{'measurement':<24} {'seconds':>10} {'ms/stack':>10}")
+    for name, seconds in timings.items():
+        per_stack = seconds * 1000 / max(len(stacks), 1)
+        print(f"{name:<24} {seconds:10.4f} {per_stack:10.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "benchmark": "suite",
+                    "revision": git_revision(),
+                    "python": platform.python_version(),
+                    "parameters": {
+                        "stacks": args.stacks,
+                        "files": args.files,
+                        "resources": args.resources,
+                        "prefix_ratio": args.prefix_ratio,
+                        "comment_styles": styles,
+                        "seed": args.seed,
+                        "jobs": args.jobs,
+                        "parse_workers": args.parse_workers,
+                        "repeat": args.repeat,
+                    },
+                    "bytes": size,
+                    "root_modules": len(stacks),
+                    "results": timings,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
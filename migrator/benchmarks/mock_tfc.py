@@ -0,0 +1,384 @@
+"""
+A local mock of the TFC/TFE API endpoints the migrator uses.
+
+Serves, over plain HTTP:
+
+  GET  /api/v2/organizations/:org/workspaces/:name   workspace show
+  GET  /api/v2/organizations/:org/workspaces         workspace list (paginated)
+  GET  /api/v2/organizations/:org/tags               organization tags (paginated)
+  POST /api/v2/organizations/:org/workspaces         create a workspace
+  POST /api/v2/workspaces/:id/relationships/tags     add tags to a workspace
+  POST /api/v2/tags/:id/relationships/workspaces     add a tag to many workspaces
+
+Workspaces are generated up front (`ws-00000`, `ws-00001`, ... by default).
+Every response can be delayed (--latency, --jitter), and requests can be
+answered with 429 at random (--throttle) or once a per-second budget is used
+up (--rate-limit), with Retry-After and X-RateLimit-* headers like TFC.
+
+Run it standalone and point the migrator at it:
+
+    python3 benchmarks/mock_tfc.py --workspaces 10000 --port 8080 --throttle 0.02
+    python3 migrate_tfc.py --token x --hostname 127.0.0.1:8080 --api-scheme http ...
+
+or start it in-process with start_mock_server() (see bench_api.py).
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+WORKSPACE_SHOW_RE = re.compile(r"^/api/v2/organizations/([^/]+)/workspaces/([^/]+)$")
+WORKSPACE_LIST_RE = re.compile(r"^/api/v2/organizations/([^/]+)/workspaces$")
+TAG_LIST_RE = re.compile(r"^/api/v2/organizations/([^/]+)/tags$")
+WORKSPACE_TAGS_RE = re.compile(r"^/api/v2/workspaces/([^/]+)/relationships/tags$")
+TAG_WORKSPACES_RE = re.compile(r"^/api/v2/tags/([^/]+)/relationships/workspaces$")
+
+
+class MockTfc:
+    """In-memory organizations, workspaces and tags. Thread-safe."""
+
+    def __init__(self, org: str, workspaces: int, name_format: str = "ws-{:05d}"):
+        self.org = org
+        self._lock = threading.Lock()
+        self.workspaces: Dict[str, dict] = {}
+        self.by_id: Dict[str, dict] = {}
+        self.tags: Dict[str, str] = {}
+        for i in range(workspaces):
+            self._add_workspace(name_format.format(i))
+
+    def _add_workspace(self, name: str) -> dict:
+        ws = {"id": f"ws-{len(self.by_id):08x}", "name": name, "tags": []}
+        self.workspaces[name] = ws
+        self.by_id[ws["id"]] = ws
+        return ws
+
+    def _tag_id(self, name: str) -> str:
+        if name not in self.tags:
+            self.tags[name] = f"tag-{len(self.tags):08x}"
+        return self.tags[name]
+
+    def workspace_json(self, ws: dict) -> dict:
+        return {
+            "id": ws["id"],
+            "type": "workspaces",
+            "attributes": {"name": ws["name"], "tag-names": list(ws["tags"])},
+        }
+
+    def show(self, org: str, name: str) -> Optional[dict]:
+        with self._lock:
+            ws = self.workspaces.get(name) if org == self.org else None
+            return self.workspace_json(ws) if ws else None
+
+    def list_workspaces(self, org: str) -> List[dict]:
+        with self._lock:
+            if org != self.org:
+                return []
+            return [self.workspace_json(ws) for ws in self.workspaces.values()]
+
+    def list_tags(self, org: str) -> List[dict]:
+        with self._lock:
+            if org != self.org:
+                return []
+            return [
+                {"id": tag_id, "type": "tags", "attributes": {"name": name}}
+                for name, tag_id in self.tags.items()
+            ]
+
+    def create(self, org: str, name: str, tags: List[str]) -> Optional[dict]:
+        """Create a workspace; None if the org is unknown or the name is taken."""
+        with self._lock:
+            if org != self.org or name in self.workspaces:
+                return None
+            ws = self._add_workspace(name)
+            for tag in tags:
+                self._tag_id(tag)
+                ws["tags"].append(tag)
+            return self.workspace_json(ws)
+
+    def add_tags(self, ws_id: str, names: List[str]) -> bool:
+        with self._lock:
+            ws = self.by_id.get(ws_id)
+            if ws is None:
+                return False
+            for name in names:
+                self._tag_id(name)
+                if name not in ws["tags"]:
+                    ws["tags"].append(name)
+            return True
+
+    def tag_workspaces(self, tag_id: str, ws_ids: List[str]) -> bool:
+        with self._lock:
+            names = [name for name, i in self.tags.items() if i == tag_id]
+            if not names or any(i not in self.by_id for i in ws_ids):
+                return False
+            for ws_id in ws_ids:
+                tags = self.by_id[ws_id]["tags"]
+                if names[0] not in tags:
+                    tags.append(names[0])
+            return True
+
+
+class MockTfcServer(ThreadingHTTPServer):
+    """
+    ThreadingHTTPServer serving a MockTfc, with injected latency and 429s.
+    Counts requests by status code in `stats`.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        state: MockTfc,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        throttle: float = 0.0,
+        rate_limit: float = 0.0,
+        retry_after: float = 1.0,
+        max_page_size: int = MAX_PAGE_SIZE,
+        seed: Optional[int] = None,
+    ):
+        super().__init__(address, _Handler)
+        self.state = state
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle = throttle
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.max_page_size = max_page_size
+        self.stats: Dict[int, int] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window = 0
+        self._window_count = 0
+
+    @property
+    def hostname(self) -> str:
+        host, port = self.server_address[:2]
+        return f"{host}:{port}"
+
+    def admit(self) -> Optional[float]:
+        """Return None to serve the request, or seconds for Retry-After."""
+        with self._lock:
+            if self.throttle and self._random.random() < self.throttle:
+                return self.retry_after
+            if self.rate_limit:
+                window = int(time.monotonic())
+                if window != self._window:
+                    self._window, self._window_count = window, 0
+                self._window_count += 1
+                if self._window_count > self.rate_limit:
+                    return 1.0 - (time.monotonic() % 1.0)
+            return None
+
+    def remaining(self) -> int:
+        with self._lock:
+            if not self.rate_limit:
+                return 1000
+            return max(int(self.rate_limit) - self._window_count, 0)
+
+    def delay(self) -> float:
+        with self._lock:
+            return max(self.latency + self._random.uniform(-self.jitter, self.jitter), 0.0)
+
+    def count(self, status: int) -> None:
+        with self._lock:
+            self.stats[status] = self.stats.get(status, 0) + 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: MockTfcServer
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _send(self, status: int, body: Optional[dict] = None, headers=()) -> None:
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/vnd.api+json")
+        self.send_header("Content-Length", str(len(payload)))
+        if self.server.rate_limit:
+            self.send_header("X-RateLimit-Limit", str(int(self.server.rate_limit)))
+            self.send_header("X-RateLimit-Remaining", str(self.server.remaining()))
+            self.send_header("X-RateLimit-Reset", f"{1.0 - time.monotonic() % 1.0:.3f}")
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+        self.server.count(status)
+
+    def _error(self, status: int, title: str) -> None:
+        self._send(status, {"errors": [{"status": str(status), "title": title}]})
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        return json.loads(raw) if raw else {}
+
+    def _page(self, items: List[dict], query: str) -> dict:
+        params = parse_qs(query)
+        size = min(
+            int(params.get("page[size]", [DEFAULT_PAGE_SIZE])[0]),
+            self.server.max_page_size,
+        )
+        number = max(int(params.get("page[number]", ["1"])[0]), 1)
+        total_pages = max((len(items) + size - 1) // size, 1)
+        return {
+            "data": items[(number - 1) * size:number * size],
+            "meta": {
+                "pagination": {
+                    "current-page": number,
+                    "page-size": size,
+                    "prev-page": number - 1 if number > 1 else None,
+                    "next-page": number + 1 if number < total_pages else None,
+                    "total-pages": total_pages,
+                    "total-count": len(items),
+                }
+            },
+        }
+
+    def _admit(self) -> bool:
+        time.sleep(self.server.delay())
+        retry_after = self.server.admit()
+        if retry_after is None:
+            return True
+        self._send(
+            429,
+            {"errors": [{"status": "429", "title": "Too Many Requests"}]},
+            headers=[("Retry-After", f"{retry_after:.3f}")],
+        )
+        return False
+
+    def do_GET(self) -> None:
+        if not self._admit():
+            return
+        url = urlsplit(self.path)
+        state = self.server.state
+        m = WORKSPACE_SHOW_RE.match(url.path)
+        if m:
+            ws = state.show(*m.groups())
+            if ws is None:
+                self._error(404, "not found")
+            else:
+                self._send(200, {"data": ws})
+            return
+        m = WORKSPACE_LIST_RE.match(url.path)
+        if m:
+            self._send(200, self._page(state.list_workspaces(m.group(1)), url.query))
+            return
+        m = TAG_LIST_RE.match(url.path)
+        if m:
+            self._send(200, self._page(state.list_tags(m.group(1)), url.query))
+            return
+        self._error(404, "not found")
+
+    def do_POST(self) -> None:
+        body = self._body()
+        if not self._admit():
+            return
+        path = urlsplit(self.path).path
+        state = self.server.state
+        m = WORKSPACE_TAGS_RE.match(path)
+        if m:
+            names = [t["attributes"]["name"] for t in body.get("data", [])]
+            if state.add_tags(m.group(1), names):
+                self._send(204)
+            else:
+                self._error(404, "not found")
+            return
+        m = WORKSPACE_LIST_RE.match(path)
+        if m:
+            attrs = body.get("data", {}).get("attributes", {})
+            ws = state.create(m.group(1), attrs.get("name", ""), attrs.get("tag-names") or [])
+            if ws is None:
+                self._error(422, "Name has already been taken")
+            else:
+                self._send(201, {"data": ws})
+            return
+        m = TAG_WORKSPACES_RE.match(path)
+        if m:
+            ids = [w["id"] for w in body.get("data", [])]
+            if state.tag_workspaces(m.group(1), ids):
+                self._send(204)
+            else:
+                self._error(404, "not found")
+            return
+        self._error(404, "not found")
+
+
+def start_mock_server(
+    org: str = "bench-org",
+    workspaces: int = 1000,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    **options,
+) -> MockTfcServer:
+    """
+    Start a MockTfcServer on a background thread and return it. `options`
+    are passed to MockTfcServer. Call shutdown() when done.
+    """
+    server = MockTfcServer((host, port), MockTfc(org, workspaces), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind")
+    parser.add_argument("--port", type=int, default=8080, help="Port to bind")
+    parser.add_argument("--org", default="bench-org", help="Organization name")
+    parser.add_argument("--workspaces", type=int, default=1000, help="Workspaces to create")
+    parser.add_argument(
+        "--name-format",
+        default="ws-{:05d}",
+        help="Workspace name format, given the index (default: ws-{:05d})",
+    )
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- seconds on the latency")
+    parser.add_argument("--throttle", type=float, default=0.0, help="Probability of a random 429")
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=0.0,
+        help="Answer 429 beyond this many requests per second (0 disables)",
+    )
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After for random 429s")
+    parser.add_argument(
+        "--max-page-size",
+        type=int,
+        default=MAX_PAGE_SIZE,
+        help=f"Largest page[size] honored (default: {MAX_PAGE_SIZE})",
+    )
+    args = parser.parse_args()
+
+    server = MockTfcServer(
+        (args.host, args.port),
+        MockTfc(args.org, args.workspaces, args.name_format),
+        latency=args.latency,
+        jitter=args.jitter,
+        throttle=args.throttle,
+        rate_limit=args.rate_limit,
+        retry_after=args.retry_after,
+        max_page_size=args.max_page_size,
+    )
+    print(f"Mock TFC API for '{args.org}' ({args.workspaces} workspaces) on http://{server.hostname}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Responses by status: {json.dumps(server.stats, sort_keys=True)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,115 @@
+from __future__ import annotations
+
 import argparse
+import codecs
+import contextlib
+import functools
+import hashlib
+import importlib
+import io
+import json
+import math
 import os
+import queue
+import random
 import re
 import shutil
+import signal
+import socket
+import socketserver
+import sqlite3
 import subprocess
 import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+class _LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access, so
+    runs that never parse HCL or call the API (e.g. a dry run over a tree
+    without remote backends) don't pay for importing hcl2/lark or requests.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
 
-import hcl2
-import requests
+hcl2 = _LazyModule("hcl2")
+multiprocessing = _LazyModule("multiprocessing")
+requests = _LazyModule("requests")
 
 # --- Constants & Defaults ---
 DEFAULT_HOSTNAME = "app.terraform.io"
 DEFAULT_TARGET_DIRECTORIES = ["."]
+DEFAULT_JOBS = 1
+DEFAULT_MAX_INITS = 4
+DEFAULT_API_TIMEOUT = 30
+DEFAULT_API_SCHEME = "https"
+DEFAULT_API_POOL_SIZE = 10
+WORKSPACE_PAGE_SIZE = 100
+DEFAULT_API_MAX_RETRIES = 5
+MAX_RETRY_DELAY = 60.0
+# TFC allows 30 requests/second per token
+DEFAULT_API_RATE = 30.0
+# Shrink API concurrency when smoothed latency exceeds this multiple of the best seen
+LATENCY_BACKOFF_FACTOR = 3.0
+# ...and by at least this many seconds, so sub-millisecond jitter is ignored
+LATENCY_BACKOFF_SLACK = 0.05
+RETRYABLE_STATUS_CODES = frozenset({429, 502, 503, 504})
+
+# Directory names never descended into by --recursive discovery
+PRUNED_DIRECTORIES = frozenset({".git", ".terraform", "modules", "tests"})
+TF_EXCLUDED_PATTERNS = (".tfvars", ".tfstate", ".backup", ".bak")
+
+# Bump when locator/parser output changes so stale cache entries are ignored
+PARSE_CACHE_VERSION = 1
+LOCK_FILE_NAME = ".terraform.lock.hcl"
+DEFAULT_INIT_TIMEOUT = 1800
+# terraform fmt indents each nesting level by two spaces
+HCL_INDENT = "  "
+DEFAULT_CACHE_MAX_ENTRIES = 50000
+# While every parse worker is busy, queued terraform blocks are sent in chunks of about this size
+PARSE_CHUNK_BYTES = 16 * 1024
+# --serve re-lists an organization's workspaces once its index is this old
+SERVE_INDEX_MAX_AGE = 300.0
+
+# Cheap byte-level check used while walking trees for root modules
+REMOTE_BACKEND_MARKER_RE = re.compile(rb'backend\s+"remote"')
+
+# Files without this token cannot declare a backend and are never parsed
+BACKEND_TOKEN = b"backend"
+
+# provider "<address>" { version = "<version>" ... } in .terraform.lock.hcl
+LOCK_PROVIDER_RE = re.compile(
+    r'^provider\s+"(?P<address>[^"]+)"\s*\{[^}]*?^\s*version\s*=\s*"(?P<version>[^"]+)"',
+    re.MULTILINE,
+)
+
+# Terraform leaves "Enter a value:" on an unterminated line while it waits
+INPUT_PROMPT_RE = re.compile(r"Enter a value:\s*$")
+# Questions terraform init asks while moving state to the cloud backend
+STATE_MIGRATION_QUESTION_RE = re.compile(
+    r"\b(copy|migrate)\b.*\b(state|workspaces?)\b", re.IGNORECASE
+)
 
-# Regex for targeted HCL replacement
-REMOTE_BACKEND_RE = re.compile(
-    r'(terraform\s+\{.*?)backend\s+"remote"\s+\{(?P<backend_content>.*?)\}(.*?\})',
-    re.MULTILINE | re.DOTALL,
+# Lexical landmarks for the brace-matching block scanner
+_TOP_LEVEL_RE = re.compile(r'[{"#/<]|(?<![\w.-])terraform(?=\s*\{)')
+_BLOCK_SPECIAL_RE = re.compile(r'[{}"#/<]')
+_STRING_SPECIAL_RE = re.compile(r'["\\]|[$%]\{')
+_HEREDOC_RE = re.compile(r'<<-?([A-Za-z_][\w-]*)[ \t]*\r?\n')
+_TERRAFORM_BODY_RE = re.compile(
+    r'[{}"#/<]|(?<![\w.-])backend[ \t]+(?:"remote"|remote)\s*\{'
 )
 
 
@@ -47,20 +139,285 @@ def parse_args():
         metavar="DIR",
         help="Directory to migrate (repeatable). Default: current directory.",
     )
+    parser.add_argument(
+        "-r",
+        "--recursive",
+        metavar="ROOT",
+        help=(
+            "Recursively discover every root module under ROOT that declares a "
+            'backend "remote" block (skips .terraform/, modules/ and tests/)'
+        ),
+    )
     parser.add_argument(
         "--backup",
         action="store_true",
         help="Write .bak backup of modified files before changing them",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=DEFAULT_JOBS,
+        metavar="N",
+        help=f"Migrate up to N directories concurrently (default: {DEFAULT_JOBS})",
+    )
+    parser.add_argument(
+        "--max-inits",
+        type=int,
+        default=DEFAULT_MAX_INITS,
+        metavar="N",
+        help=(
+            "Cap on concurrent 'terraform init' processes across all jobs "
+            f"(default: {DEFAULT_MAX_INITS})"
+        ),
+    )
+    parser.add_argument(
+        "--prefetch-workspaces",
+        action="store_true",
+        help=(
+            "List each organization's workspaces once (paginated) and answer "
+            "workspace/tag lookups from memory instead of one GET per workspace"
+        ),
+    )
+    parser.add_argument(
+        "--init-timeout",
+        type=int,
+        default=DEFAULT_INIT_TIMEOUT,
+        metavar="SECONDS",
+        help=(
+            "Kill terraform init (and its child processes) after this long "
+            f"(default: {DEFAULT_INIT_TIMEOUT}, 0 disables)"
+        ),
+    )
+    parser.add_argument(
+        "--log-dir",
+        metavar="DIR",
+        help=(
+            "Write each directory's terraform init output here as it streams "
+            "(default: ~/.cache/tfc-migrator/logs)"
+        ),
+    )
+    parser.add_argument(
+        "--plugin-cache-dir",
+        metavar="DIR",
+        help=(
+            "Shared TF_PLUGIN_CACHE_DIR for every terraform init (default: "
+            "$TF_PLUGIN_CACHE_DIR or ~/.cache/tfc-migrator/plugin-cache)"
+        ),
+    )
+    parser.add_argument(
+        "--no-plugin-cache",
+        action="store_true",
+        help="Let each terraform init download providers into its own .terraform/",
+    )
+    parser.add_argument(
+        "--provider-mirror",
+        metavar="DIR",
+        help=(
+            "Build a filesystem provider mirror in DIR once from the union of all "
+            "target .terraform.lock.hcl files and install providers only from it"
+        ),
+    )
+    parser.add_argument(
+        "--plan-out",
+        metavar="PATH",
+        help=(
+            "Write the planned change for every directory to PATH as JSON "
+            "(byte range, replacement, file hash, org, workspace and tag)"
+        ),
+    )
+    parser.add_argument(
+        "--apply",
+        metavar="PLAN",
+        help=(
+            "Execute a plan written by --plan-out without re-scanning; fails "
+            "if any planned file changed since (implies --no-dry-run)"
+        ),
+    )
+    parser.add_argument(
+        "--journal",
+        metavar="PATH",
+        help=(
+            "Append each directory's progress to this JSONL journal "
+            "(default: ~/.cache/tfc-migrator/journal.jsonl)"
+        ),
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip directories the journal records as done and continue half-done ones",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the on-disk parse cache",
+    )
+    parser.add_argument(
+        "--api-rate",
+        type=float,
+        default=DEFAULT_API_RATE,
+        metavar="RPS",
+        help=f"Maximum TFC API requests per second (default: {DEFAULT_API_RATE:g})",
+    )
+    parser.add_argument(
+        "--metrics-out",
+        metavar="PATH",
+        help=(
+            "Write per-stage timings, the slowest directories and API counts to "
+            "PATH (Prometheus textfile if it ends in .prom, JSON otherwise)"
+        ),
+    )
+    parser.add_argument(
+        "--api-scheme",
+        choices=("https", "http"),
+        default=DEFAULT_API_SCHEME,
+        help=(
+            "Scheme for TFC API calls; use http only for a local mock such as "
+            f"benchmarks/mock_tfc.py (default: {DEFAULT_API_SCHEME})"
+        ),
+    )
+    parser.add_argument(
+        "--defer-tags",
+        action="store_true",
+        help=(
+            "Collect workspace tags during the run and apply them at the end, "
+            "grouped by tag with bulk API calls (implies --prefetch-workspaces)"
+        ),
+    )
+    parser.add_argument(
+        "--no-create-workspaces",
+        action="store_true",
+        help=(
+            "Fail a directory whose target workspace doesn't exist instead of "
+            "creating it before the files are rewritten"
+        ),
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=0,
+        metavar="N",
+        help=(
+            "Parse HCL2 in N worker processes instead of in the scan threads; "
+            "use with --jobs of at least N (default: 0, in-process)"
+        ),
+    )
+    parser.add_argument(
+        "--since",
+        metavar="REF",
+        help=(
+            "Only consider directories whose .tf files changed since git REF "
+            "(committed, uncommitted or untracked), skipping ones the journal "
+            "records as done"
+        ),
+    )
+    parser.add_argument(
+        "--serve",
+        metavar="SOCKET",
+        help=(
+            "Stay resident and run migration jobs sent as JSON to this Unix "
+            "socket, reusing the API connections, caches and parser across jobs"
+        ),
+    )
+    parser.add_argument(
+        "--connect",
+        metavar="SOCKET",
+        help=(
+            "Run this migration on the --serve daemon at SOCKET; the daemon's "
+            "token, hostname, jobs and cache settings apply"
+        ),
+    )
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.max_inits < 1:
+        parser.error("--max-inits must be at least 1")
+    if args.api_rate <= 0:
+        parser.error("--api-rate must be positive")
+    if args.parse_workers < 0:
+        parser.error("--parse-workers must not be negative")
+    if args.init_timeout < 0:
+        parser.error("--init-timeout must not be negative")
+    if args.recursive and args.directories:
+        parser.error("--recursive cannot be combined with -d/--directory")
+    if args.apply and (args.recursive or args.directories):
+        parser.error("--apply takes its directories from the plan")
+    if args.apply and args.since:
+        parser.error("--since cannot be combined with --apply")
+    if args.serve and args.connect:
+        parser.error("--serve and --connect are mutually exclusive")
+    if args.serve and (
+        args.directories
+        or args.recursive
+        or args.apply
+        or args.plan_out
+        or args.no_dry_run
+        or args.resume
+        or args.backup
+        or args.since
+    ):
+        parser.error("--serve takes directories and run options from each job")
+    if args.serve and (args.provider_mirror or args.metrics_out):
+        parser.error("--provider-mirror and --metrics-out cannot be used with --serve")
+    if args.apply:
+        args.no_dry_run = True
+    return args
+
+
+def journal_path(args) -> str:
+    """The journal file: --journal, or journal.jsonl in the cache directory."""
+    return os.path.abspath(args.journal or os.path.join(cache_home(), "journal.jsonl"))
 
 
 def get_config(args):
-    """Resolve configuration from CLI args, env vars, or constants."""
+    """
+    Resolve configuration from CLI args, env vars, or constants.
+    With --apply, the hostname and directories come from the plan, which is
+    returned too (otherwise None).
+    """
     token = args.token or os.getenv("TFC_TOKEN")
     hostname = args.hostname or os.getenv("TFC_HOSTNAME") or DEFAULT_HOSTNAME
-    directories = args.directories or DEFAULT_TARGET_DIRECTORIES
-    directories = [os.path.abspath(d) for d in directories]
+    planned = None
+    if args.apply:
+        try:
+            planned = MigrationPlan.load(args.apply)
+        except PlanMismatchError as e:
+            print(f"❌ ERROR: {args.apply} no longer matches the files on disk:")
+            for line in str(e).splitlines():
+                print(f"  └─ {line}")
+            sys.exit(1)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"❌ ERROR: Could not read plan {args.apply}: {e}")
+            sys.exit(1)
+        if args.hostname and args.hostname != planned.hostname:
+            print(
+                f"❌ ERROR: {args.apply} was planned for {planned.hostname}, "
+                f"not {args.hostname}"
+            )
+            sys.exit(1)
+        hostname = planned.hostname
+        directories = sorted(planned.plans)
+        print(f"📋 PLAN: {len(directories)} directory(ies) from {args.apply}")
+    elif args.since:
+        try:
+            directories = changed_targets(
+                args.since,
+                root=os.path.abspath(args.recursive) if args.recursive else None,
+                directories=[
+                    os.path.abspath(d)
+                    for d in args.directories or DEFAULT_TARGET_DIRECTORIES
+                ],
+                journal_path=journal_path(args),
+            )
+        except GitDiffError as e:
+            print(f"❌ ERROR: Could not list changes since {args.since}: {e}")
+            sys.exit(1)
+    elif args.recursive:
+        # Lazily walked so migrations start while discovery is still running
+        directories = discover_root_modules(os.path.abspath(args.recursive))
+    else:
+        directories = args.directories or DEFAULT_TARGET_DIRECTORIES
+        directories = [os.path.abspath(d) for d in directories]
 
     if not args.no_dry_run:
         print("💡 MODE: DRY RUN (no changes will be saved)")
@@ -69,361 +426,3706 @@ def get_config(args):
         sys.exit(1)
 
     print(f"🌐 TARGET HOST: {hostname}")
-    return token, hostname, directories
+    return token, hostname, directories, planned
 
 
-def check_terraform_installed() -> None:
-    """Check if terraform binary is available in PATH."""
-    try:
-        subprocess.run(
-            ["terraform", "version"],
-            capture_output=True,
-            check=True,
-            timeout=10,
-        )
-    except FileNotFoundError:
-        print("❌ ERROR: terraform binary not found. Please install Terraform.")
-        sys.exit(1)
-    except subprocess.CalledProcessError:
-        print("❌ ERROR: terraform binary exists but failed to run.")
-        sys.exit(1)
+class _ThreadLocalStdout(io.TextIOBase):
+    """
+    Stand-in for sys.stdout that routes writes from worker threads into a
+    per-thread buffer, so concurrent directory migrations don't interleave.
+    Threads without a buffer (e.g. the main thread) write straight through.
+    """
 
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
 
-def ensure_tfc_tag(
-    hostname: str,
-    org: str,
-    workspace_name: str,
-    tag: str,
-    token: str,
-) -> None:
-    """Ensure the workspace has the given tag; add it via TFC API if missing."""
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/vnd.api+json",
-    }
-    base_url = f"https://{hostname}/api/v2"
+    def start_capture(self, buffer: Optional[io.StringIO] = None) -> None:
+        self._local.buffer = buffer if buffer is not None else io.StringIO()
 
-    try:
-        url = f"{base_url}/organizations/{org}/workspaces/{workspace_name}"
-        resp = requests.get(url, headers=headers, timeout=30)
-        if resp.status_code != 200:
-            print(
-                f"  └─ API: GET workspace failed ({resp.status_code}): {resp.text[:200]}"
-            )
-            return
-        ws_data = resp.json()["data"]
-        ws_id = ws_data["id"]
-        # Workspace show returns tag-names (list of strings), not tags.
-        existing = ws_data.get("attributes", {}).get("tag-names") or []
+    def stop_capture(self) -> str:
+        buf = getattr(self._local, "buffer", None)
+        self._local.buffer = None
+        return buf.getvalue() if buf is not None else ""
 
-        if tag in existing:
-            return
-        tag_url = f"{base_url}/workspaces/{ws_id}/relationships/tags"
-        post = requests.post(
-            tag_url,
-            headers=headers,
-            json={"data": [{"type": "tags", "attributes": {"name": tag}}]},
-            timeout=30,
-        )
-        if post.status_code in (200, 204):
-            print(
-                f"  └─ API: Added tag '{tag}' to workspace '{workspace_name}' on {hostname}"
-            )
-        else:
-            print(
-                f"  └─ API: Add tag failed ({post.status_code}): {post.text[:200]}"
-            )
-    except requests.RequestException as e:
-        print(f"  └─ API Error: {hostname}: {e}")
+    def write(self, s: str) -> int:
+        buf = getattr(self._local, "buffer", None)
+        if buf is not None:
+            return buf.write(s)
+        return self._stream.write(s)
 
+    def flush(self) -> None:
+        self._stream.flush()
 
-def discover_tf_files(directory: str) -> List[str]:
+
+class RunMetrics:
     """
-    Discover all Terraform configuration files (.tf) in the given directory.
-    Excludes .tfvars, .tfstate, and backup files.
-    Returns a sorted list of filenames (not full paths).
+    Wall-clock timings for each phase of a run (discover, read, parse,
+    rewrite, fmt, init, tag, api_get, api_post), kept per sample so the
+    report can give percentiles, and summed per directory to find the slowest.
+    Thread-safe.
     """
-    excluded_patterns = ('.tfvars', '.tfstate', '.backup', '.bak')
-    tf_files = []
 
-    try:
-        for entry in os.listdir(directory):
-            # Check if it's a file and ends with .tf
-            full_path = os.path.join(directory, entry)
-            if os.path.isfile(full_path) and entry.endswith('.tf'):
-                # Exclude files matching excluded patterns
-                if not any(pattern in entry for pattern in excluded_patterns):
-                    tf_files.append(entry)
-    except (OSError, PermissionError) as e:
-        print(f"  └─ Warning: Could not read directory {directory}: {e}")
-        return []
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, List[float]] = {}
+        self._folders: Dict[str, float] = {}
 
-    return sorted(tf_files)
+    @contextlib.contextmanager
+    def timed(self, stage: str, folder: Optional[str] = None) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, folder)
 
+    def observe(self, stage: str, seconds: float, folder: Optional[str] = None) -> None:
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds)
+            if folder is not None:
+                self._folders[folder] = self._folders.get(folder, 0.0) + seconds
 
-def parse_remote_backend(content: str) -> Optional[dict]:
-    """
-    Parse Terraform configuration using HCL2 library to extract remote backend config.
-    Returns dict with organization, name, prefix, and hostname if found, else None.
-    Falls back to regex if HCL2 parsing fails.
-    """
-    try:
-        # Parse HCL content
-        parsed = hcl2.loads(content)
+    def summary(self) -> Dict[str, dict]:
+        """Per stage: count, total, p50, p95 and max seconds."""
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+        return {
+            stage: {
+                "count": len(values),
+                "total": sum(values),
+                "p50": _percentile(values, 0.50),
+                "p95": _percentile(values, 0.95),
+                "max": values[-1],
+            }
+            for stage, values in samples.items()
+        }
 
-        # Navigate to terraform.backend.remote
-        if "terraform" not in parsed:
-            return None
+    def slowest(self, n: int = 5) -> List[Tuple[str, float]]:
+        """The `n` directories with the most time spent in timed stages."""
+        with self._lock:
+            folders = list(self._folders.items())
+        return sorted(folders, key=lambda item: item[1], reverse=True)[:n]
 
-        for tf_block in parsed["terraform"]:
-            if "backend" not in tf_block:
-                continue
 
-            backend = tf_block["backend"]
-            if not isinstance(backend, list):
-                continue
+def _percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted, non-empty `values`."""
+    return values[max(math.ceil(q * len(values)) - 1, 0)]
 
-            for backend_item in backend:
-                if "remote" not in backend_item:
-                    continue
 
-                remote_config = backend_item["remote"]
-                if not isinstance(remote_config, list) or len(remote_config) == 0:
-                    continue
+# Timings for the whole run; reported by main().
+_metrics = RunMetrics()
 
-                config = remote_config[0]
 
-                # Extract values - HCL2 automatically handles comments
-                result = {
-                    "organization": config.get("organization"),
-                    "hostname": config.get("hostname"),
-                }
+# Global cap on concurrent `terraform init` processes; resized by main().
+_init_slots = threading.BoundedSemaphore(DEFAULT_MAX_INITS)
 
-                # Check for workspace config
-                if "workspaces" in config and isinstance(config["workspaces"], list):
-                    ws = config["workspaces"][0] if config["workspaces"] else {}
-                    result["name"] = ws.get("name")
-                    result["prefix"] = ws.get("prefix")
-                else:
-                    result["name"] = None
-                    result["prefix"] = None
 
-                return result if result.get("organization") else None
+def set_max_inits(limit: int) -> None:
+    """Resize the global cap on concurrent terraform init processes."""
+    global _init_slots
+    _init_slots = threading.BoundedSemaphore(limit)
 
-        return None
 
-    except Exception as e:
-        # Fall back to regex-based parsing if HCL2 fails
-        print(f"  └─ Warning: HCL2 parsing failed, using regex fallback: {e}")
-        return None
+class TerraformNotFoundError(RuntimeError):
+    """The terraform binary is missing from PATH or fails to run."""
 
 
-def migrate_directory(
-    folder: str,
-    token: Optional[str],
-    hostname: str,
-    dry_run: bool,
-    backup: bool,
-) -> bool:
+# Outcome of the one terraform check per run: None until checked, then an
+# error message, or "" if terraform works.
+_terraform_error: Optional[str] = None
+_terraform_lock = threading.Lock()
+
+
+def check_terraform_installed() -> None:
     """
-    Migrate remote backend to cloud block in discovered .tf files.
-    Scans all .tf files in the directory and processes the first one containing a remote backend.
-    Returns True if migrated.
+    Check if terraform binary is available in PATH.
+    Only the first call runs `terraform version`; later calls repeat its
+    outcome. Non-dry runs call it before any directory is touched; dry runs
+    never do, so they never spawn terraform. Raises TerraformNotFoundError.
     """
-    tf_files = discover_tf_files(folder)
+    global _terraform_error
+    with _terraform_lock:
+        if _terraform_error is None:
+            try:
+                subprocess.run(
+                    ["terraform", "version"],
+                    capture_output=True,
+                    check=True,
+                    timeout=10,
+                )
+                _terraform_error = ""
+            except FileNotFoundError:
+                _terraform_error = "terraform binary not found. Please install Terraform."
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+                _terraform_error = "terraform binary exists but failed to run."
+    if _terraform_error:
+        raise TerraformNotFoundError(_terraform_error)
 
-    if not tf_files:
-        print("  └─ No .tf files found in directory")
-        return False
 
-    files_with_backends = []
-    for filename in tf_files:
-        path = os.path.join(folder, filename)
+def read_lock_file(folder: str) -> List[Tuple[str, str]]:
+    """Return the (provider address, version) pairs pinned in a lock file."""
+    try:
+        with open(os.path.join(folder, LOCK_FILE_NAME), "r", encoding="utf-8") as f:
+            content = f.read()
+    except OSError:
+        return []
+    return [
+        (m.group("address"), m.group("version"))
+        for m in LOCK_PROVIDER_RE.finditer(content)
+    ]
+
+
+class ProviderCache:
+    """
+    Provider installation shared by every terraform init the migrator runs.
+    All inits get the same TF_PLUGIN_CACHE_DIR, so each provider version is
+    downloaded once and linked into every other directory. Terraform does not
+    lock the cache, so the first init needing a not-yet-cached provider
+    version holds a per-provider lock and later inits wait for it rather
+    than racing to write the same files. With a CLI config file from
+    build_provider_mirror(), providers come from a local mirror only.
+    """
+
+    def __init__(self, cache_dir: Optional[str], cli_config: Optional[str] = None):
+        self.cache_dir = cache_dir
+        self.cli_config = cli_config
+        self._env = dict(os.environ)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._env["TF_PLUGIN_CACHE_DIR"] = cache_dir
+        if cli_config:
+            self._env["TF_CLI_CONFIG_FILE"] = cli_config
+        self._warm = set()
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
 
+    def env(self) -> dict:
+        """Environment for terraform subprocesses."""
+        return self._env
+
+    @contextlib.contextmanager
+    def warming(self, folder: str):
+        """Hold the locks for providers `folder` would add to the cache."""
+        if not self.cache_dir:
+            yield
+            return
+        with self._lock:
+            pending = sorted(set(read_lock_file(folder)) - self._warm)
+            locks = [self._locks.setdefault(p, threading.Lock()) for p in pending]
+        # Sorted acquisition keeps concurrent inits deadlock-free
+        for lock in locks:
+            lock.acquire()
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                content = f.read()
-        except (OSError, PermissionError) as e:
-            print(f"  └─ Warning: Could not read {filename}: {e}")
-            continue
-        match = REMOTE_BACKEND_RE.search(content)
+            yield
+            with self._lock:
+                self._warm.update(pending)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
 
-        if not match:
-            continue
 
-        files_with_backends.append(filename)
+def build_provider_mirror(directories: List[str], mirror_dir: str) -> Optional[str]:
+    """
+    Mirror every provider version pinned by the directories' lock files into
+    `mirror_dir` with `terraform providers mirror`, then write a CLI config
+    that installs from that mirror only. Returns the CLI config path, or None
+    if no lock files pin any providers.
+    """
+    versions: Dict[str, List[str]] = {}
+    for folder in directories:
+        for address, version in read_lock_file(folder):
+            if version not in versions.setdefault(address, []):
+                versions[address].append(version)
+    if not versions:
+        print("  └─ Warning: No provider versions found in lock files; no mirror built")
+        return None
 
-    # Warn if multiple files contain remote backends
-    if len(files_with_backends) > 1:
-        print(f"  └─ Warning: Found {len(files_with_backends)} files with remote backends: {', '.join(files_with_backends)}")
-        print(f"  └─ Warning: Only the first file ({files_with_backends[0]}) will be migrated")
+    mirror_dir = os.path.abspath(mirror_dir)
+    os.makedirs(mirror_dir, exist_ok=True)
+    # A configuration can require one version per provider, so mirror in rounds
+    rounds = max(len(v) for v in versions.values())
+    for r in range(rounds):
+        required = "\n".join(
+            f'    p{i} = {{\n      source  = "{address}"\n'
+            f'      version = "= {vs[r]}"\n    }}'
+            for i, (address, vs) in enumerate(sorted(versions.items()))
+            if r < len(vs)
+        )
+        with tempfile.TemporaryDirectory(prefix="tfc-mirror-") as config_dir:
+            with open(os.path.join(config_dir, "main.tf"), "w", encoding="utf-8") as f:
+                f.write(f"terraform {{\n  required_providers {{\n{required}\n  }}\n}}\n")
+            subprocess.run(
+                ["terraform", "providers", "mirror", mirror_dir],
+                cwd=config_dir,
+                check=True,
+                capture_output=True,
+            )
+    count = sum(len(v) for v in versions.values())
+    print(f"📦 Mirrored {count} provider version(s) into {mirror_dir}")
 
-    # Process the first file with a remote backend
-    for filename in files_with_backends[:1]:
-        path = os.path.join(folder, filename)
+    cli_config = os.path.join(mirror_dir, "migrator.tfrc")
+    with open(cli_config, "w", encoding="utf-8") as f:
+        f.write(
+            "provider_installation {\n"
+            "  filesystem_mirror {\n"
+            f"    path = {json.dumps(mirror_dir)}\n"
+            "  }\n"
+            "}\n"
+        )
+    return cli_config
 
-        with open(path, "r", encoding="utf-8") as f:
-            content = f.read()
 
-        # Try HCL2 parsing first
-        backend_config = parse_remote_backend(content)
+class UnexpectedPromptError(RuntimeError):
+    """terraform asked a question the migrator does not know how to answer."""
 
-        if backend_config:
-            # Use HCL2 parsed values
-            org = backend_config.get("organization")
-            name = backend_config.get("name")
-            prefix = backend_config.get("prefix")
+
+def _kill_process_tree(process: subprocess.Popen) -> None:
+    """Kill a process started by stream_process() and everything it spawned."""
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
         else:
-            # Fall back to regex parsing
-            match = REMOTE_BACKEND_RE.search(content)
-            if not match:
-                continue
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+    process.wait()
 
-            ws_info = match.group("backend_content")
 
-            # Regex fallback - exclude commented lines
-            org_m = re.search(r'(?m)^(?![\s]*#).*?\borganization\s+=\s+"(?P<val>[^"]+)"', ws_info)
-            name_m = re.search(r'(?m)^(?![\s]*#).*?\bname\s+=\s+"(?P<val>[^"]+)"', ws_info)
-            pref_m = re.search(r'(?m)^(?![\s]*#).*?\bprefix\s+=\s+"(?P<val>[^"]+)"', ws_info)
+# Processes started by stream_process() that are still running
+_live_processes: Set[subprocess.Popen] = set()
+_live_lock = threading.Lock()
+# Set once the run is interrupted; no new processes are started after that
+_interrupted = threading.Event()
 
-            org = org_m.group("val") if org_m else None
-            name = name_m.group("val") if name_m else None
-            prefix = pref_m.group("val") if pref_m else None
 
-        # Validate we have required configuration
-        if not org:
-            continue
+def kill_running_processes() -> int:
+    """
+    Kill every process tree started by stream_process() that is still
+    running and refuse to start new ones. Inits run in their own session
+    (and, with --jobs, on worker threads), so Ctrl-C never reaches them
+    otherwise. Returns how many were killed.
+    """
+    _interrupted.set()
+    with _live_lock:
+        processes = list(_live_processes)
+    for process in processes:
+        _kill_process_tree(process)
+    return len(processes)
 
-        host_line = (
-            f'    hostname = "{hostname}"\n'
-            if hostname != DEFAULT_HOSTNAME
-            else ""
-        )
 
-        if name:
-            ws_config = f'name = "{name}"'
-            ws_name_api = None
-            clean_tag = None
-        elif prefix:
-            clean_tag = prefix.strip("-")
-            ws_config = f'tags = ["{clean_tag}"]'
-            ws_name_api = Path(folder).resolve().name
-        else:
-            continue
+def _pump_output(fd: int, chunks: "queue.Queue[Optional[bytes]]") -> None:
+    """Reader thread: forward raw output chunks until EOF (None)."""
+    try:
+        while True:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            chunks.put(chunk)
+    finally:
+        chunks.put(None)
 
-        # Re-read content for regex replacement (needed for text substitution)
-        match = REMOTE_BACKEND_RE.search(content)
-        if not match:
-            continue
 
-        cloud_block = (
-            f'cloud {{\n{host_line}    organization = "{org}"\n'
-            f"    workspaces {{\n      {ws_config}\n    }}\n  }}"
+def stream_process(
+    cmd: List[str],
+    cwd: str,
+    log_path: Optional[str] = None,
+    timeout: Optional[float] = None,
+    env: Optional[dict] = None,
+) -> Tuple[int, str]:
+    """
+    Run `cmd`, echoing combined stdout/stderr line by line as it arrives and
+    appending it to `log_path`. State-migration questions ("copy existing
+    state...?") are answered "yes" when terraform actually asks them; any
+    other prompt kills the process and raises UnexpectedPromptError.
+    The whole process tree is killed on timeout (subprocess.TimeoutExpired)
+    or interrupt. Returns (returncode, output).
+    """
+    with _live_lock:
+        if _interrupted.is_set():
+            raise RuntimeError(f"Interrupted; not starting {cmd[0]}")
+        process = subprocess.Popen(
+            cmd,
+            cwd=cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=env,
+            start_new_session=os.name == "posix",
         )
-        new_content = REMOTE_BACKEND_RE.sub(rf"\1{cloud_block}", content)
+        _live_processes.add(process)
+    chunks: "queue.Queue[Optional[bytes]]" = queue.Queue()
+    threading.Thread(
+        target=_pump_output, args=(process.stdout.fileno(), chunks), daemon=True
+    ).start()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    deadline = time.monotonic() + timeout if timeout else None
+    log = open(log_path, "a", encoding="utf-8") if log_path else None
+    output: List[str] = []
+    pending = ""
 
-        if dry_run:
-            tag_msg = f" and add tag to '{ws_name_api}'" if ws_name_api else ""
-            print(
-                f"  └─ [DRY RUN] Would update {filename} with host '{hostname}'"
-                f", {ws_config}{tag_msg}"
-            )
-            return True
+    def emit(text: str) -> None:
+        output.append(text)
+        print(text, end="", flush=True)
+        if log:
+            log.write(text)
+            log.flush()
 
-        # Always create a temporary backup before making changes
-        backup_path = f"{path}.bak"
-        temp_backup = not backup  # Track if this is a temporary backup to clean up later
-        shutil.copy2(path, backup_path)
+    try:
+        while True:
+            remaining = deadline - time.monotonic() if deadline else None
+            if remaining is not None and remaining <= 0:
+                raise subprocess.TimeoutExpired(cmd, timeout, "".join(output))
+            try:
+                chunk = chunks.get(timeout=min(remaining, 1.0) if remaining else 1.0)
+            except queue.Empty:
+                continue
+            if chunk is None:
+                break
+            pending += decoder.decode(chunk)
+            lines = pending.split("\n")
+            pending = lines.pop()
+            for line in lines:
+                emit(line + "\n")
 
+            if INPUT_PROMPT_RE.search(pending):
+                emit(pending + "\n")
+                pending = ""
+                recent = "".join(output[-6:])
+                if not STATE_MIGRATION_QUESTION_RE.search(recent):
+                    raise UnexpectedPromptError(
+                        f"{cmd[0]} is waiting for input: {recent.strip()[-200:]}"
+                    )
+                emit("  └─ Answered 'yes' to state migration prompt\n")
+                process.stdin.write(b"yes\n")
+                process.stdin.flush()
+
+        if pending:
+            emit(pending + "\n")
+        remaining = deadline - time.monotonic() if deadline else None
         try:
-            # Write the new content
-            with open(path, "w", encoding="utf-8") as f:
-                f.write(new_content)
-            print(f"  └─ HCL: Migrated {filename}")
+            returncode = process.wait(timeout=remaining)
+        except subprocess.TimeoutExpired:
+            raise subprocess.TimeoutExpired(cmd, timeout, "".join(output))
+    except BaseException:
+        _kill_process_tree(process)
+        raise
+    finally:
+        with _live_lock:
+            _live_processes.discard(process)
+        if log:
+            log.close()
+        process.stdin.close()
+        process.stdout.close()
+    return returncode, "".join(output)
 
-            # Format the file with terraform fmt
-            try:
-                subprocess.run(
-                    ["terraform", "fmt", path],
-                    cwd=folder,
-                    check=True,
-                    capture_output=True,
-                )
-                print(f"  └─ HCL: Formatted {filename}")
-            except subprocess.CalledProcessError as e:
-                print(f"  └─ Warning: Could not format {filename}: {e}")
-
-            # Run terraform init and automatically answer "yes" to migrate state
-            # Note: -migrate-state flag is NOT compatible with Terraform Cloud migrations
-            # TFC requires interactive prompts, so we pipe "yes" to stdin instead
-            process = subprocess.Popen(
-                ["terraform", "init"],
-                cwd=folder,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-            )
-            output, _ = process.communicate(input="yes\n")
-            print(output)
-            if process.returncode != 0:
-                raise subprocess.CalledProcessError(process.returncode, "terraform init")
-            print(f"  └─ Terraform: Initialized workspace and migrated state")
-
-            # Add tag to workspace after init (for prefix-based workspaces)
-            if ws_name_api and clean_tag and token:
-                ensure_tfc_tag(hostname, org, ws_name_api, clean_tag, token)
-
-            # If we made it here successfully and backup was temporary, clean it up
-            if temp_backup:
-                try:
-                    os.remove(backup_path)
-                except OSError:
-                    pass  # Ignore errors cleaning up temp backup
 
-            return True
+def init_log_path(log_dir: str, folder: str) -> str:
+    """Per-directory log file name derived from the directory's path."""
+    name = re.sub(r"[^\w.-]+", "_", os.path.abspath(folder)).strip("_")
+    return os.path.join(log_dir, f"{name}.init.log")
 
-        except Exception as e:
-            # Migration failed - restore the original file
-            print(f"  └─ ❌ ERROR: Migration failed for {filename}")
-            print(f"  └─ ERROR: {type(e).__name__}: {e}")
-            print(f"  └─ Restoring original configuration from backup...")
 
-            try:
-                shutil.copy2(backup_path, path)
-                print(f"  └─ ✓ Successfully restored {filename} to original state")
-            except Exception as restore_error:
-                print(f"  └─ ❌ CRITICAL: Failed to restore backup: {restore_error}")
-                print(f"  └─ Original file is at: {backup_path}")
-                return False
+def _header_seconds(resp: requests.Response, header: str) -> Optional[float]:
+    """Parse a numeric header value (seconds or count), or None."""
+    value = resp.headers.get(header)
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        return None
 
-            # If backup was meant to be temporary, still keep it since migration failed
-            if temp_backup:
-                print(f"  └─ Backup retained at: {backup_path}")
 
-            return False
-    return False
+class RequestScheduler:
+    """
+    Central gate for all TFC API traffic.
+    - A token bucket caps the request rate (TFC allows 30 req/s per token).
+    - 429 responses and exhausted X-RateLimit-Remaining pause every caller
+      until Retry-After / X-RateLimit-Reset has passed.
+    - The number of requests in flight adapts AIMD-style: it grows by one
+      after a window of healthy responses, halves on 429 and shrinks by one
+      while smoothed latency is well above the best latency observed.
+    Thread-safe; one instance is shared by every thread using a TfcClient.
+    """
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_API_RATE,
+        max_concurrency: int = DEFAULT_API_POOL_SIZE,
+        min_concurrency: int = 1,
+    ):
+        self.rate = rate
+        self.capacity = max(rate, 1.0)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min(min_concurrency, max_concurrency)
+        self.limit = max_concurrency
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._best_latency: Optional[float] = None
+        self._avg_latency: Optional[float] = None
+        self._healthy = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        """Block until a rate token and a concurrency slot are available."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self._in_flight >= self.limit:
+                        wait = None  # woken by release()
+                    elif self._tokens < 1:
+                        wait = (1 - self._tokens) / self.rate
+                    else:
+                        self._tokens -= 1
+                        self._in_flight += 1
+                        self.requests += 1
+                        return
+                self._cond.wait(timeout=wait)
+
+    def release(
+        self, latency: float, resp: Optional[requests.Response] = None
+    ) -> None:
+        """Return a slot and feed the response back into the limits."""
+        with self._cond:
+            self._in_flight -= 1
+            if resp is not None:
+                self._observe(latency, resp)
+            self._cond.notify_all()
+
+    def _observe(self, latency: float, resp: requests.Response) -> None:
+        now = time.monotonic()
+        remaining = _header_seconds(resp, "X-RateLimit-Remaining")
+        reset = _header_seconds(resp, "X-RateLimit-Reset")
+        if remaining is not None and remaining < 1 and reset:
+            self._pause(now + reset)
+
+        if resp.status_code == 429:
+            self.throttled += 1
+            delay = _header_seconds(resp, "Retry-After")
+            self._pause(now + (delay if delay is not None else reset or 1.0))
+            self.limit = max(self.min_concurrency, self.limit // 2)
+            self._healthy = 0
+            return
+        if resp.status_code >= 500:
+            return
+
+        if self._best_latency is None or latency < self._best_latency:
+            self._best_latency = latency
+        self._avg_latency = (
+            latency
+            if self._avg_latency is None
+            else 0.8 * self._avg_latency + 0.2 * latency
+        )
+        if (
+            self._avg_latency > LATENCY_BACKOFF_FACTOR * self._best_latency
+            and self._avg_latency - self._best_latency > LATENCY_BACKOFF_SLACK
+        ):
+            if self.limit > self.min_concurrency:
+                self.limit -= 1
+            self._healthy = 0
+            return
+        self._healthy += 1
+        if self._healthy >= self.limit and self.limit < self.max_concurrency:
+            self.limit += 1
+            self._healthy = 0
+
+    def _pause(self, until: float) -> None:
+        until = min(until, time.monotonic() + MAX_RETRY_DELAY)
+        self._paused_until = max(self._paused_until, until)
+
+    def record_retry(self) -> None:
+        with self._cond:
+            self.retries += 1
+
+    def backoff(self, attempt: int) -> float:
+        """Jittered exponential delay before retry `attempt` (0-based)."""
+        ceiling = min(2.0 ** attempt, MAX_RETRY_DELAY)
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+class TfcClient:
+    """
+    Minimal TFC/TFE API v2 client.
+    Owns a single requests.Session so every call reuses pooled keep-alive
+    connections instead of paying a TCP+TLS handshake per request. The session
+    is shared by all migration threads; size the pool to the number of jobs.
+    All requests go through a RequestScheduler for rate limiting and retries.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        token: str,
+        pool_size: int = DEFAULT_API_POOL_SIZE,
+        timeout: int = DEFAULT_API_TIMEOUT,
+        max_retries: int = DEFAULT_API_MAX_RETRIES,
+        scheduler: Optional[RequestScheduler] = None,
+        scheme: str = DEFAULT_API_SCHEME,
+    ):
+        self.hostname = hostname
+        self.base_url = f"{scheme}://{hostname}/api/v2"
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.scheduler = scheduler or RequestScheduler(max_concurrency=pool_size)
+        self.session = requests.Session()
+        self.session.headers.update(
+            {
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/vnd.api+json",
+            }
+        )
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """
+        Issue a request against a path relative to /api/v2.
+        429, 502-504 and connection errors are retried up to max_retries
+        times. A 429 pauses the scheduler for Retry-After, so the retry (and
+        every other caller) waits; other failures back off with jitter.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        url = f"{self.base_url}{path}"
+        scheduler = self.scheduler
+        attempt = 0
+        with _metrics.timed(f"api_{method.lower()}"):
+            while True:
+                scheduler.acquire()
+                start = time.monotonic()
+                resp = None
+                try:
+                    resp = self.session.request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt >= self.max_retries:
+                        raise
+                finally:
+                    scheduler.release(time.monotonic() - start, resp)
+
+                if resp is not None and (
+                    resp.status_code not in RETRYABLE_STATUS_CODES
+                    or attempt >= self.max_retries
+                ):
+                    return resp
+                scheduler.record_retry()
+                if resp is None or resp.status_code != 429:
+                    time.sleep(scheduler.backoff(attempt))
+                attempt += 1
+
+    def get_workspace(self, org: str, workspace_name: str) -> requests.Response:
+        return self.request("GET", f"/organizations/{org}/workspaces/{workspace_name}")
+
+    def add_workspace_tags(self, ws_id: str, tags: List[str]) -> requests.Response:
+        return self.request(
+            "POST",
+            f"/workspaces/{ws_id}/relationships/tags",
+            json={"data": [{"type": "tags", "attributes": {"name": t}} for t in tags]},
+        )
+
+    def create_workspace(
+        self, org: str, workspace_name: str, tags: List[str]
+    ) -> requests.Response:
+        attributes: dict = {"name": workspace_name}
+        if tags:
+            attributes["tag-names"] = list(tags)
+        return self.request(
+            "POST",
+            f"/organizations/{org}/workspaces",
+            json={"data": {"type": "workspaces", "attributes": attributes}},
+        )
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "TfcClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class WorkspaceIndex:
+    """
+    In-memory index of an organization's workspaces keyed by name.
+    Each organization is listed once with paginated page[size]=100 calls the
+    first time it is needed; afterwards workspace and tag lookups are dict
+    hits. Entries are {"id": ..., "tag-names": [...]}. With `max_age`, an
+    organization listed longer ago than that many seconds is listed again, so
+    a long-lived index (--serve) sees workspaces created since. Thread-safe.
+    """
+
+    def __init__(self, client: TfcClient, max_age: Optional[float] = None):
+        self.client = client
+        self.max_age = max_age
+        self._orgs: Dict[str, Optional[Dict[str, dict]]] = {}
+        self._listed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def load(self, org: str) -> Optional[Dict[str, dict]]:
+        """Return the name -> entry map for `org`, or None if listing failed."""
+        with self._lock:
+            expired = (
+                self.max_age is not None
+                and time.monotonic() - self._listed.get(org, 0.0) > self.max_age
+            )
+            if org not in self._orgs or expired:
+                self._orgs[org] = self._fetch(org)
+                self._listed[org] = time.monotonic()
+            return self._orgs[org]
+
+    def _fetch(self, org: str) -> Optional[Dict[str, dict]]:
+        workspaces: Dict[str, dict] = {}
+        page: Optional[int] = 1
+        try:
+            while page:
+                resp = self.client.request(
+                    "GET",
+                    f"/organizations/{org}/workspaces",
+                    params={"page[size]": WORKSPACE_PAGE_SIZE, "page[number]": page},
+                )
+                if resp.status_code != 200:
+                    print(
+                        f"  └─ API: List workspaces for '{org}' failed "
+                        f"({resp.status_code}): {resp.text[:200]}"
+                    )
+                    return None
+                body = resp.json()
+                for ws in body.get("data", []):
+                    attrs = ws.get("attributes", {})
+                    workspaces[attrs["name"]] = {
+                        "id": ws["id"],
+                        "tag-names": list(attrs.get("tag-names") or []),
+                    }
+                page = body.get("meta", {}).get("pagination", {}).get("next-page")
+        except requests.RequestException as e:
+            print(f"  └─ API Error: {self.client.hostname}: {e}")
+            return None
+        print(f"  └─ API: Indexed {len(workspaces)} workspace(s) in '{org}'")
+        return workspaces
+
+    def get(self, org: str, workspace_name: str) -> Optional[dict]:
+        workspaces = self.load(org)
+        return workspaces.get(workspace_name) if workspaces else None
+
+    def record_workspace(
+        self, org: str, workspace_name: str, ws_id: str, tags: List[str]
+    ) -> None:
+        """Add a workspace created through the API to an indexed org."""
+        with self._lock:
+            workspaces = self._orgs.get(org)
+            if workspaces is not None:
+                workspaces[workspace_name] = {"id": ws_id, "tag-names": list(tags)}
+
+    def record_tags(self, org: str, workspace_name: str, tags: List[str]) -> None:
+        """Reflect tags applied through the API in the cached entry."""
+        with self._lock:
+            entry = (self._orgs.get(org) or {}).get(workspace_name)
+            if entry is not None:
+                entry["tag-names"].extend(
+                    t for t in tags if t not in entry["tag-names"]
+                )
+
+
+class WorkspaceLookupError(RuntimeError):
+    """A workspace could not be looked up or created through the API."""
+
+
+def find_workspace(
+    client: TfcClient,
+    org: str,
+    workspace_name: str,
+    index: Optional[WorkspaceIndex] = None,
+) -> Optional[dict]:
+    """
+    Return the workspace's {"id": ..., "tag-names": [...]}, or None if it
+    doesn't exist. Answered from the index when the org is indexed.
+    Raises WorkspaceLookupError if the API call fails.
+    """
+    if index is not None and index.load(org) is not None:
+        return index.get(org, workspace_name)
+
+    resp = client.get_workspace(org, workspace_name)
+    if resp.status_code == 404:
+        return None
+    if resp.status_code != 200:
+        raise WorkspaceLookupError(
+            f"GET workspace failed ({resp.status_code}): {resp.text[:200]}"
+        )
+    ws_data = resp.json()["data"]
+    return {
+        "id": ws_data["id"],
+        "tag-names": list(ws_data.get("attributes", {}).get("tag-names") or []),
+    }
+
+
+def ensure_tfc_tag(
+    client: TfcClient,
+    org: str,
+    workspace_name: str,
+    tag: str,
+    index: Optional[WorkspaceIndex] = None,
+) -> bool:
+    """
+    Ensure the workspace has the given tag; add it via TFC API if missing.
+    With an index, the workspace lookup is answered from memory.
+    Returns True if the tag is present afterwards.
+    """
+    hostname = client.hostname
+
+    try:
+        entry = find_workspace(client, org, workspace_name, index)
+        if entry is None:
+            print(f"  └─ API: Workspace '{workspace_name}' not found in '{org}'")
+            return False
+
+        if tag in entry["tag-names"]:
+            return True
+        post = client.add_workspace_tags(entry["id"], [tag])
+        if post.status_code in (200, 204):
+            print(
+                f"  └─ API: Added tag '{tag}' to workspace '{workspace_name}' on {hostname}"
+            )
+            if index is not None:
+                index.record_tags(org, workspace_name, [tag])
+            return True
+        print(
+            f"  └─ API: Add tag failed ({post.status_code}): {post.text[:200]}"
+        )
+    except (requests.RequestException, WorkspaceLookupError) as e:
+        print(f"  └─ API Error: {hostname}: {e}")
+    return False
+
+
+def create_tfc_workspace(
+    client: TfcClient,
+    org: str,
+    workspace_name: str,
+    tags: List[str],
+    index: Optional[WorkspaceIndex] = None,
+) -> dict:
+    """
+    Create the workspace with `tags` and return its entry. If it was created
+    elsewhere in the meantime (422, name taken), the existing one is returned.
+    Raises WorkspaceLookupError if it can't be created.
+    """
+    resp = client.create_workspace(org, workspace_name, tags)
+    if resp.status_code == 201:
+        entry = {"id": resp.json()["data"]["id"], "tag-names": list(tags)}
+        print(
+            f"  └─ API: Created workspace '{workspace_name}' in '{org}' "
+            f"on {client.hostname}"
+        )
+        if index is not None:
+            index.record_workspace(org, workspace_name, entry["id"], tags)
+        return entry
+    if resp.status_code == 422:
+        entry = find_workspace(client, org, workspace_name)
+        if entry is not None:
+            if index is not None:
+                index.record_workspace(
+                    org, workspace_name, entry["id"], entry["tag-names"]
+                )
+            return entry
+    raise WorkspaceLookupError(
+        f"Create workspace failed ({resp.status_code}): {resp.text[:200]}"
+    )
+
+
+class TagBatch:
+    """
+    Deferred workspace tagging.
+    (workspace, tag) pairs are collected during the run and applied at the end,
+    grouped by tag: pairs the workspace index shows as already tagged are
+    dropped, and the rest are attached with one bulk
+    POST /tags/{id}/relationships/workspaces call per tag (per 100 workspaces).
+    Tags that don't exist in the organization yet are created by tagging the
+    first workspace individually. apply_now() tags a workspace right away,
+    sharing the bulk calls with other threads waiting for the same tag.
+    Thread-safe.
+    """
+
+    def __init__(self, client: TfcClient, index: WorkspaceIndex):
+        self.client = client
+        self.index = index
+        self._pending: Dict[Tuple[str, str], List[str]] = {}
+        # Directories whose tags are waiting on this batch
+        self.folders: List[str] = []
+        self._tag_ids: Dict[str, Dict[str, str]] = {}
+        # apply_now() callers waiting per (org, tag), and the groups being sent
+        self._waiting: Dict[Tuple[str, str], List[Tuple[str, Future]]] = {}
+        self._sending: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+
+    def add(
+        self, org: str, workspace_name: str, tag: str, folder: Optional[str] = None
+    ) -> None:
+        with self._lock:
+            names = self._pending.setdefault((org, tag), [])
+            if workspace_name not in names:
+                names.append(workspace_name)
+            if folder is not None:
+                self.folders.append(folder)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(names) for names in self._pending.values())
+
+    def apply(self, jobs: int = 1) -> int:
+        """Apply all pending tags, `jobs` tag groups at a time. Returns failures."""
+        groups = sorted(self._pending.items())
+        self._pending = {}
+        if not groups:
+            return 0
+        print(f"\n--- Applying {sum(len(n) for _, n in groups)} deferred tag(s) ---")
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            failures = pool.map(
+                lambda group: self._apply_group(group[0][0], group[0][1], group[1]),
+                groups,
+            )
+            return sum(failures)
+
+    def apply_now(self, org: str, workspace_name: str, tag: str) -> bool:
+        """
+        Tag one workspace before returning. The first caller for an
+        (org, tag) sends what is waiting for it as one group, and keeps
+        sending what queues up meanwhile; the others wait for their result.
+        Returns True if the tag is present afterwards.
+        """
+        key = (org, tag)
+        future: Future = Future()
+        with self._lock:
+            self._waiting.setdefault(key, []).append((workspace_name, future))
+            leader = key not in self._sending
+            self._sending.add(key)
+        while leader:
+            with self._lock:
+                waiting = self._waiting.pop(key, [])
+                if not waiting:
+                    self._sending.discard(key)
+                    break
+            try:
+                self._apply_group(org, tag, [name for name, _ in waiting])
+                error = None
+            except Exception as e:
+                error = e
+            for name, waiter in waiting:
+                if error is not None:
+                    waiter.set_exception(error)
+                else:
+                    entry = self.index.get(org, name)
+                    waiter.set_result(entry is not None and tag in entry["tag-names"])
+        return future.result()
+
+    def _apply_group(self, org: str, tag: str, names: List[str]) -> int:
+        """Tag every workspace in `names` with `tag`. Returns failures."""
+        if self.index.load(org) is None:
+            # No index to diff against; fall back to one workspace at a time
+            return sum(
+                not ensure_tfc_tag(self.client, org, name, tag) for name in names
+            )
+
+        failures = 0
+        targets: List[Tuple[str, str]] = []
+        for name in names:
+            entry = self.index.get(org, name)
+            if entry is None:
+                print(f"  └─ API: Workspace '{name}' not found in '{org}'")
+                failures += 1
+            elif tag not in entry["tag-names"]:
+                targets.append((name, entry["id"]))
+        if not targets:
+            return failures
+
+        applied = done = 0
+        try:
+            tag_id = self._tag_id(org, tag)
+            if tag_id is None:
+                # Creating the tag requires tagging a workspace directly
+                name, ws_id = targets.pop(0)
+                if self._tag_one(org, name, ws_id, tag):
+                    applied += 1
+                else:
+                    failures += 1
+                tag_id = self._tag_id(org, tag, refresh=True) if targets else None
+                if tag_id is None:
+                    for name, ws_id in targets:
+                        if self._tag_one(org, name, ws_id, tag):
+                            applied += 1
+                        else:
+                            failures += 1
+                    targets = []
+
+            for done in range(0, len(targets), WORKSPACE_PAGE_SIZE):
+                chunk = targets[done:done + WORKSPACE_PAGE_SIZE]
+                resp = self.client.request(
+                    "POST",
+                    f"/tags/{tag_id}/relationships/workspaces",
+                    json={
+                        "data": [{"type": "workspaces", "id": i} for _, i in chunk]
+                    },
+                )
+                if resp.status_code not in (200, 204):
+                    print(
+                        f"  └─ API: Bulk tag '{tag}' failed ({resp.status_code}): "
+                        f"{resp.text[:200]}"
+                    )
+                    failures += len(chunk)
+                    continue
+                for name, _ in chunk:
+                    self.index.record_tags(org, name, [tag])
+                applied += len(chunk)
+        except requests.RequestException as e:
+            print(f"  └─ API Error: {self.client.hostname}: {e}")
+            return failures + len(targets) - done
+
+        print(f"  └─ API: Added tag '{tag}' to {applied} workspace(s) in '{org}'")
+        return failures
+
+    def _tag_one(self, org: str, name: str, ws_id: str, tag: str) -> bool:
+        resp = self.client.add_workspace_tags(ws_id, [tag])
+        if resp.status_code not in (200, 204):
+            print(f"  └─ API: Add tag failed ({resp.status_code}): {resp.text[:200]}")
+            return False
+        self.index.record_tags(org, name, [tag])
+        return True
+
+    def _tag_id(self, org: str, tag: str, refresh: bool = False) -> Optional[str]:
+        """Look up an organization tag's id, listing the org's tags once."""
+        with self._lock:
+            if refresh or org not in self._tag_ids:
+                self._tag_ids[org] = self._list_tags(org)
+            return self._tag_ids[org].get(tag)
+
+    def _list_tags(self, org: str) -> Dict[str, str]:
+        tags: Dict[str, str] = {}
+        page: Optional[int] = 1
+        while page:
+            resp = self.client.request(
+                "GET",
+                f"/organizations/{org}/tags",
+                params={"page[size]": WORKSPACE_PAGE_SIZE, "page[number]": page},
+            )
+            if resp.status_code != 200:
+                print(
+                    f"  └─ API: List tags for '{org}' failed ({resp.status_code}): "
+                    f"{resp.text[:200]}"
+                )
+                break
+            body = resp.json()
+            for t in body.get("data", []):
+                tags[t["attributes"]["name"]] = t["id"]
+            page = body.get("meta", {}).get("pagination", {}).get("next-page")
+        return tags
+
+
+def _is_tf_filename(name: str) -> bool:
+    """True for .tf configuration files, excluding vars, state and backups."""
+    return name.endswith(".tf") and not any(
+        pattern in name for pattern in TF_EXCLUDED_PATTERNS
+    )
+
+
+def discover_tf_files(directory: str) -> List[str]:
+    """
+    Discover all Terraform configuration files (.tf) in the given directory.
+    Excludes .tfvars, .tfstate, and backup files.
+    Returns a sorted list of filenames (not full paths).
+    """
+    tf_files = []
+
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                # Filter on name first; is_file() is usually free from d_type
+                if _is_tf_filename(entry.name) and entry.is_file():
+                    tf_files.append(entry.name)
+    except (OSError, PermissionError) as e:
+        print(f"  └─ Warning: Could not read directory {directory}: {e}")
+        return []
+
+    return sorted(tf_files)
+
+
+def _has_remote_backend(path: str) -> bool:
+    """Byte-level check for a `backend "remote"` declaration in a file."""
+    try:
+        with open(path, "rb") as f:
+            return REMOTE_BACKEND_MARKER_RE.search(f.read()) is not None
+    except OSError:
+        return False
+
+
+def discover_root_modules(root: str) -> Iterator[str]:
+    """
+    Walk `root` with a single os.scandir pass per directory and yield every
+    directory whose .tf files declare a remote backend.
+    Directories are yielded as they are found (sorted, depth-first), so callers
+    can begin migrating before the walk completes. Directories named in
+    PRUNED_DIRECTORIES are never descended into.
+    """
+    pending = [root]
+    while pending:
+        current = pending.pop()
+        subdirs = []
+        has_backend = False
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except (OSError, PermissionError) as e:
+            print(f"  └─ Warning: Could not read directory {current}: {e}")
+            continue
+
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in PRUNED_DIRECTORIES:
+                    subdirs.append(entry.path)
+            elif (
+                not has_backend
+                and _is_tf_filename(entry.name)
+                and entry.is_file()
+            ):
+                has_backend = _has_remote_backend(entry.path)
+
+        if has_backend:
+            yield current
+        # Reverse so the stack pops subdirectories in sorted order
+        pending.extend(reversed(subdirs))
+
+
+class GitDiffError(RuntimeError):
+    """`git` is missing, the directory is not in a repository, or the ref is bad."""
+
+
+def _git(cwd: str, *args: str) -> str:
+    try:
+        return subprocess.run(
+            ["git", *args],
+            cwd=cwd,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    except FileNotFoundError:
+        raise GitDiffError("git binary not found")
+    except subprocess.CalledProcessError as e:
+        raise GitDiffError(e.stderr.strip() or str(e))
+
+
+def changed_tf_directories(root: str, since: str) -> Set[str]:
+    """
+    Directories at or under `root` whose .tf files differ from git ref
+    `since`: committed, staged and unstaged changes (including deletions),
+    plus untracked files that are not ignored. Directories inside
+    PRUNED_DIRECTORIES, like those skipped by discover_root_modules(), and
+    directories that no longer exist are left out. Raises GitDiffError.
+    """
+    toplevel = _git(root, "rev-parse", "--show-toplevel").strip()
+    real_root = os.path.realpath(root)
+    pathspec = ":(literal)" + os.path.relpath(real_root, toplevel)
+    names = _git(toplevel, "diff", "--name-only", "-z", since, "--", pathspec).split("\0")
+    names += _git(
+        toplevel, "ls-files", "--others", "--exclude-standard", "-z", "--", pathspec
+    ).split("\0")
+    directories = set()
+    for name in names:
+        if not _is_tf_filename(os.path.basename(name)):
+            continue
+        rel = os.path.relpath(os.path.join(toplevel, os.path.dirname(name)), real_root)
+        if rel.startswith(os.pardir) or any(
+            part in PRUNED_DIRECTORIES for part in rel.split(os.sep)
+        ):
+            continue
+        directory = os.path.normpath(os.path.join(root, rel))
+        if os.path.isdir(directory):
+            directories.add(directory)
+    return directories
+
+
+def discover_changed_root_modules(root: str, since: str) -> List[str]:
+    """
+    discover_root_modules() restricted to directories with .tf changes since
+    git ref `since`, so unchanged directories are never listed or read.
+    """
+    return [
+        d
+        for d in sorted(changed_tf_directories(root, since))
+        if any(_has_remote_backend(os.path.join(d, name)) for name in discover_tf_files(d))
+    ]
+
+
+def _skip_line(text: str, i: int) -> int:
+    """Index just past the end of the line containing `i`."""
+    j = text.find("\n", i)
+    return len(text) if j < 0 else j + 1
+
+
+def _skip_comment_or_heredoc(text: str, i: int) -> int:
+    """
+    If a comment or heredoc starts at `i`, return the index just past it;
+    otherwise return i + 1 (the character at `i` is ordinary).
+    """
+    c = text[i]
+    if c == "#" or text.startswith("//", i):
+        return _skip_line(text, i)
+    if text.startswith("/*", i):
+        j = text.find("*/", i + 2)
+        if j < 0:
+            raise ValueError("unterminated block comment")
+        return j + 2
+    if c == "<":
+        m = _HEREDOC_RE.match(text, i)
+        if m:
+            end = re.compile(
+                r"^[ \t]*" + re.escape(m.group(1)) + r"[ \t]*\r?$", re.MULTILINE
+            ).search(text, m.end())
+            if not end:
+                raise ValueError(f"unterminated heredoc {m.group(1)}")
+            return _skip_line(text, end.end())
+    return i + 1
+
+
+def _skip_string(text: str, i: int) -> int:
+    """`i` is at an opening quote; return the index just past the closing one."""
+    pos = i + 1
+    while True:
+        m = _STRING_SPECIAL_RE.search(text, pos)
+        if not m:
+            raise ValueError("unterminated string")
+        token = m.group()
+        if token == '"':
+            return m.end()
+        if token == "\\":
+            pos = m.end() + 1
+        else:
+            # ${...} / %{...} template: may contain nested strings and braces
+            pos = _match_brace(text, m.end() - 1)
+
+
+def _match_brace(text: str, i: int) -> int:
+    """
+    `i` is at an opening "{"; return the index just past its matching "}".
+    Braces inside strings, templates, comments and heredocs are ignored.
+    Raises ValueError if the braces are unbalanced.
+    """
+    depth = 0
+    pos = i
+    while True:
+        m = _BLOCK_SPECIAL_RE.search(text, pos)
+        if not m:
+            raise ValueError("unbalanced braces")
+        c = m.group()
+        start = m.start()
+        if c == "{":
+            depth += 1
+            pos = start + 1
+        elif c == "}":
+            depth -= 1
+            pos = start + 1
+            if depth == 0:
+                return pos
+        elif c == '"':
+            pos = _skip_string(text, start)
+        else:
+            pos = _skip_comment_or_heredoc(text, start)
+
+
+def iter_terraform_blocks(
+    text: str, stop: Optional[int] = None
+) -> Iterator[Tuple[int, int]]:
+    """
+    Yield (start, end) offsets of every top-level `terraform { ... }` block,
+    optionally only those starting at or before offset `stop`.
+    Other top-level blocks are skipped wholesale by brace matching, so the
+    cost is one linear pass regardless of how many resources the file holds.
+    """
+    pos = 0
+    while True:
+        m = _TOP_LEVEL_RE.search(text, pos)
+        if not m or (stop is not None and m.start() > stop):
+            return
+        c = m.group()
+        start = m.start()
+        if c == "terraform":
+            end = _match_brace(text, text.index("{", m.end()))
+            yield start, end
+            pos = end
+        elif c == "{":
+            pos = _match_brace(text, start)
+        elif c == '"':
+            pos = _skip_string(text, start)
+        else:
+            pos = _skip_comment_or_heredoc(text, start)
+
+
+class RemoteBackendBlock:
+    """
+    Offsets of a `backend "remote" { ... }` block and its enclosing
+    `terraform` block. `start`/`end` span the whole backend block, from the
+    `backend` keyword through its closing brace; `body_start`/`body_end` span
+    the text between its braces. All ends are exclusive.
+    """
+
+    __slots__ = (
+        "start",
+        "end",
+        "body_start",
+        "body_end",
+        "terraform_start",
+        "terraform_end",
+    )
+
+    def __init__(
+        self,
+        start: int,
+        end: int,
+        body_start: int,
+        body_end: int,
+        terraform_start: int,
+        terraform_end: int,
+    ):
+        self.start = start
+        self.end = end
+        self.body_start = body_start
+        self.body_end = body_end
+        self.terraform_start = terraform_start
+        self.terraform_end = terraform_end
+
+    def __repr__(self) -> str:
+        return f"RemoteBackendBlock(start={self.start}, end={self.end})"
+
+    def astuple(self) -> Tuple[int, ...]:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+
+def locate_remote_backend(text: str) -> Optional[RemoteBackendBlock]:
+    """
+    Locate the first `backend "remote"` block declared directly inside a
+    top-level `terraform` block. Runs in one linear pass with no
+    backtracking, ignores strings, comments and heredocs, and handles nested
+    blocks such as `workspaces {}`.
+
+    Offsets index into `text`. To get byte offsets, pass file bytes decoded
+    as latin-1: every HCL delimiter is ASCII, so the mapping is 1:1.
+    Returns None if there is no remote backend. Raises ValueError if braces,
+    strings or heredocs are unterminated.
+    """
+    # No terraform block starting after the last `backend` token can hold one
+    last = text.rfind("backend")
+    if last < 0:
+        return None
+    for tf_start, tf_end in iter_terraform_blocks(text, stop=last):
+        pos = text.index("{", tf_start) + 1
+        while True:
+            m = _TERRAFORM_BODY_RE.search(text, pos, tf_end)
+            if not m or m.group() == "}":
+                break
+            c = m.group()
+            start = m.start()
+            if c.startswith("backend"):
+                end = _match_brace(text, m.end() - 1)
+                return RemoteBackendBlock(
+                    start, end, m.end(), end - 1, tf_start, tf_end
+                )
+            if c == "{":
+                pos = _match_brace(text, start)
+            elif c == '"':
+                pos = _skip_string(text, start)
+            else:
+                pos = _skip_comment_or_heredoc(text, start)
+    return None
+
+
+_hcl2_lock = threading.Lock()
+_hcl2_ready = False
+
+
+def _prepare_hcl2() -> None:
+    """
+    Build python-hcl2's parser once per process, before parsing threads race
+    to build it. Releases that build the parser with lark keep the compiled
+    LALR tables in a cache file inside the hcl2 package; in a read-only
+    site-packages that file can't be written and every run recompiles the
+    grammar (seconds), so point it at the migrator's cache directory instead.
+    Older releases ship a precompiled standalone parser and need nothing.
+    """
+    global _hcl2_ready
+    with _hcl2_lock:
+        if _hcl2_ready:
+            return
+        _hcl2_ready = True
+        parser_module = importlib.import_module("hcl2.parser")
+        build = getattr(parser_module, "parser", None)
+        if not callable(build) or not hasattr(parser_module, "PARSER_FILE"):
+            return
+        cache_file = Path(parser_module.PARSER_FILE)
+        if not cache_file.exists() and not os.access(cache_file.parent, os.W_OK):
+            try:
+                version = importlib.import_module("hcl2.version").__version__
+            except (ImportError, AttributeError):
+                version = "unknown"
+            cache_dir = cache_home()
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                parser_module.PARSER_FILE = Path(cache_dir) / f"hcl2-{version}.lark"
+            except OSError:
+                pass  # Build without a cache file
+        build()
+
+
+def parse_remote_backend(content: str) -> Optional[dict]:
+    """
+    Parse Terraform configuration using HCL2 library to extract remote backend config.
+    Only the `terraform` blocks that mention a backend are handed to the HCL2
+    parser; the rest of the file (resources, locals, modules) is never parsed.
+    Returns dict with organization, name, prefix, and hostname if found, else None.
+    Falls back to regex if HCL2 parsing fails.
+    """
+    if "backend" not in content:
+        return None
+
+    try:
+        spans = list(iter_terraform_blocks(content))
+    except ValueError:
+        # Scanner disagrees with the file's syntax; let HCL2 see all of it
+        spans = [(0, len(content))]
+    snippet = "\n".join(
+        content[a:b] for a, b in spans if "backend" in content[a:b]
+    )
+    if not snippet:
+        return None
+
+    try:
+        # Parse HCL content
+        _prepare_hcl2()
+        parsed = hcl2.loads(snippet + "\n")
+
+        # Navigate to terraform.backend.remote
+        if "terraform" not in parsed:
+            return None
+
+        for tf_block in parsed["terraform"]:
+            if "backend" not in tf_block:
+                continue
+
+            backend = tf_block["backend"]
+            if not isinstance(backend, list):
+                continue
+
+            for backend_item in backend:
+                if "remote" not in backend_item:
+                    continue
+
+                remote_config = backend_item["remote"]
+                if not isinstance(remote_config, list) or len(remote_config) == 0:
+                    continue
+
+                config = remote_config[0]
+
+                # Extract values - HCL2 automatically handles comments
+                result = {
+                    "organization": config.get("organization"),
+                    "hostname": config.get("hostname"),
+                }
+
+                # Check for workspace config
+                if "workspaces" in config and isinstance(config["workspaces"], list):
+                    ws = config["workspaces"][0] if config["workspaces"] else {}
+                    result["name"] = ws.get("name")
+                    result["prefix"] = ws.get("prefix")
+                else:
+                    result["name"] = None
+                    result["prefix"] = None
+
+                return result if result.get("organization") else None
+
+        return None
+
+    except Exception as e:
+        # Fall back to regex-based parsing if HCL2 fails
+        print(f"  └─ Warning: HCL2 parsing failed, using regex fallback: {e}")
+        return None
+
+
+def _parse_worker_init() -> None:
+    """ParsePool worker initializer: build the hcl2 parser once per process."""
+    # Ctrl-C is handled by the parent, which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _prepare_hcl2()
+
+
+def _parse_chunk(texts: List[str]) -> List[Tuple[Optional[dict], str]]:
+    """
+    ParsePool worker side: parse_remote_backend() each text. Returns the
+    extracted settings and anything printed (warnings) for each, so the
+    caller can log it in the right directory's output.
+    """
+    results = []
+    for text in texts:
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            config = parse_remote_backend(text)
+        results.append((config, out.getvalue()))
+    return results
+
+
+class ParsePool:
+    """
+    Runs parse_remote_backend() in worker processes, so HCL2 parsing (pure
+    Python, holding the GIL) scales with cores instead of being serialized
+    across scan threads. Each worker builds the parser once, and only the
+    small extracted settings dict comes back. A caller's text is sent as
+    soon as a worker is idle. While all are busy, texts queue up and are
+    sent together once about `chunk_bytes` have built up or a worker frees
+    up, so small blocks share a round trip and a large one goes alone.
+    Thread-safe; parse() blocks the calling thread until its result is in.
+    """
+
+    def __init__(self, workers: int, chunk_bytes: int = PARSE_CHUNK_BYTES):
+        self.workers = workers
+        self.chunk_bytes = chunk_bytes
+        self.parsed = 0
+        self.chunks = 0
+        # spawn, not fork: the parent is multi-threaded when the pool starts
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_parse_worker_init,
+        )
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[str, Future]] = []
+        self._pending_bytes = 0
+        self._in_flight = 0
+
+    def parse(self, text: str) -> Optional[dict]:
+        """parse_remote_backend(text), run in a worker process."""
+        future: Future = Future()
+        with self._lock:
+            self._pending.append((text, future))
+            self._pending_bytes += len(text)
+            chunk = (
+                self._take()
+                if self._in_flight < self.workers
+                or self._pending_bytes >= self.chunk_bytes
+                else None
+            )
+        if chunk:
+            self._submit(chunk)
+        config, printed = future.result()
+        if printed:
+            print(printed, end="")
+        return config
+
+    def _take(self) -> List[Tuple[str, Future]]:
+        """Claim everything pending as one chunk. Call with the lock held."""
+        chunk, self._pending, self._pending_bytes = self._pending, [], 0
+        self._in_flight += 1
+        self.chunks += 1
+        self.parsed += len(chunk)
+        return chunk
+
+    def _submit(self, chunk: List[Tuple[str, Future]]) -> None:
+        try:
+            done = self._executor.submit(_parse_chunk, [text for text, _ in chunk])
+        except Exception as e:  # e.g. BrokenProcessPool after a worker died
+            done = Future()
+            done.set_exception(e)
+        done.add_done_callback(functools.partial(self._finished, chunk))
+
+    def _finished(self, chunk: List[Tuple[str, Future]], done: Future) -> None:
+        error = done.exception()
+        for i, (_, future) in enumerate(chunk):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(done.result()[i])
+        with self._lock:
+            self._in_flight -= 1
+            chunk = self._take() if self._pending else None
+        if chunk:
+            self._submit(chunk)
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+
+# Worker processes for HCL2 parsing; None parses in the calling thread.
+_parse_pool: Optional[ParsePool] = None
+
+
+def set_parse_workers(workers: int) -> None:
+    """Parse with `workers` worker processes, or in-process for 0."""
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.close()
+    _parse_pool = ParsePool(workers) if workers > 0 else None
+
+
+def parse_backend_config(content: str) -> Optional[dict]:
+    """parse_remote_backend(), in a parse worker when a pool is set up."""
+    pool = _parse_pool
+    if pool is not None:
+        try:
+            return pool.parse(content)
+        except Exception as e:
+            print(f"  └─ Warning: Parse worker failed, parsing in-process: {e}")
+    return parse_remote_backend(content)
+
+
+def cache_home() -> str:
+    """The migrator's cache directory under $XDG_CACHE_HOME (default ~/.cache)."""
+    base = os.getenv("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "tfc-migrator")
+
+
+def default_cache_path() -> str:
+    """Parse cache database location."""
+    return os.path.join(cache_home(), f"parse-cache-v{PARSE_CACHE_VERSION}.sqlite3")
+
+
+class ParseCache:
+    """
+    SQLite-backed cache of per-file scan results.
+    Entries are keyed by path and only hit when size, mtime and sha256 all
+    still match, so an unchanged file skips locating and parsing entirely.
+    Each entry holds the backend block offsets (or none) and, once computed,
+    the extracted (organization, name, prefix). Least recently used entries
+    beyond `max_entries` are evicted on close(). Writes and last-used times
+    are batched until flush() (once per scanned directory) or close(), so a
+    warm run doesn't pay an fsync'd commit per file. Thread-safe.
+    """
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_CACHE_MAX_ENTRIES):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # Hits whose last_used has not been written yet
+        self._touched: Dict[str, float] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER,"
+            " sha256 TEXT, block TEXT, settings TEXT, last_used REAL)"
+        )
+        self._db.commit()
+
+    def get(
+        self, path: str, size: int, mtime_ns: int, sha256: str
+    ) -> Optional[Tuple[Optional[list], Optional[list]]]:
+        """Return (block, settings) for a matching entry, else None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT block, settings FROM entries"
+                " WHERE path = ? AND size = ? AND mtime_ns = ? AND sha256 = ?",
+                (path, size, mtime_ns, sha256),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[path] = time.time()
+        return json.loads(row[0]), json.loads(row[1])
+
+    def put(
+        self,
+        path: str,
+        size: int,
+        mtime_ns: int,
+        sha256: str,
+        block: Optional[list],
+        settings: Optional[list],
+    ) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    path,
+                    size,
+                    mtime_ns,
+                    sha256,
+                    json.dumps(block),
+                    json.dumps(settings),
+                    time.time(),
+                ),
+            )
+            self._touched.pop(path, None)
+            self._dirty = True
+
+    def flush(self) -> None:
+        """Commit pending entries and last-used times."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._touched:
+            self._db.executemany(
+                "UPDATE entries SET last_used = ? WHERE path = ?",
+                [(used, path) for path, used in self._touched.items()],
+            )
+            self._touched.clear()
+            self._dirty = True
+        if self._dirty:
+            self._db.commit()
+            self._dirty = False
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            self._db.execute(
+                "DELETE FROM entries WHERE path IN ("
+                " SELECT path FROM entries ORDER BY last_used DESC"
+                " LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+            self._db.close()
+
+
+class TerraformFile:
+    """
+    A .tf file read from disk exactly once.
+    Files without the `backend` token are rejected without decoding. Otherwise
+    the remote backend block is located once, as exact byte offsets, by
+    locate_remote_backend(); backend settings are parsed at most once and the
+    rewrite, dry-run report and extraction all reuse that result.
+    With a ParseCache, results for unchanged files come from the cache.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        data: bytes,
+        cache: Optional[ParseCache] = None,
+        stat: Optional[os.stat_result] = None,
+    ):
+        self.path = path
+        self.filename = os.path.basename(path)
+        self.data = data
+        self.block: Optional[RemoteBackendBlock] = None
+        self._settings: Optional[Tuple[Optional[str], ...]] = None
+        self._cache = cache
+        self._cache_key: Optional[Tuple[str, int, int, str]] = None
+
+        if cache is not None and stat is not None:
+            self._cache_key = (
+                path,
+                stat.st_size,
+                stat.st_mtime_ns,
+                hashlib.sha256(data).hexdigest(),
+            )
+            cached = cache.get(*self._cache_key)
+            if cached is not None:
+                block, settings = cached
+                self.block = RemoteBackendBlock(*block) if block else None
+                self._settings = tuple(settings) if settings else None
+                return
+
+        if BACKEND_TOKEN in data:
+            try:
+                self.block = locate_remote_backend(data.decode("latin-1"))
+            except ValueError as e:
+                print(f"  └─ Warning: Could not scan {self.filename}: {e}")
+        self._store()
+
+    @classmethod
+    def load(cls, path: str, cache: Optional[ParseCache] = None) -> "TerraformFile":
+        folder = os.path.dirname(path)
+        with _metrics.timed("read", folder), open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            data = f.read()
+        with _metrics.timed("parse", folder):
+            return cls(path, data, cache, stat)
+
+    def _store(self) -> None:
+        if self._cache_key is not None:
+            self._cache.put(
+                *self._cache_key,
+                self.block.astuple() if self.block else None,
+                self._settings,
+            )
+
+    @property
+    def has_remote_backend(self) -> bool:
+        return self.block is not None
+
+    @property
+    def newline(self) -> str:
+        """The file's line ending: CRLF if its first line ends with one."""
+        first = self.data.find(b"\n")
+        return "\r\n" if first > 0 and self.data[first - 1:first] == b"\r" else "\n"
+
+    def backend_settings(self) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """Return (organization, name, prefix) of the remote backend."""
+        if self._settings is None:
+            with _metrics.timed("parse", os.path.dirname(self.path)):
+                self._settings = self._parse_settings()
+            self._store()
+        return self._settings
+
+    def _parse_settings(self) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        block = self.block
+        if block is None:
+            return None, None, None
+
+        # Try HCL2 parsing first, on the enclosing terraform block only
+        backend_config = parse_backend_config(
+            self.data[block.terraform_start:block.terraform_end].decode("utf-8")
+        )
+        if backend_config:
+            return (
+                backend_config.get("organization"),
+                backend_config.get("name"),
+                backend_config.get("prefix"),
+            )
+
+        # Fall back to regex parsing of the already-located block
+        return parse_backend_regex(
+            self.data[block.body_start:block.body_end].decode("utf-8")
+        )
+
+    def _own_lines(self) -> Optional[Tuple[int, int]]:
+        """
+        (line_start, line_end) of the backend block's lines, or None when it
+        shares them with other code (trailing comments are allowed).
+        """
+        block = self.block
+        line_start = self.data.rfind(b"\n", 0, block.start) + 1
+        line_end = self.data.find(b"\n", block.end)
+        if line_end < 0:
+            line_end = len(self.data)
+        before = self.data[line_start:block.start]
+        after = self.data[block.end:line_end].strip()
+        if before.strip() or (after and not after.startswith((b"#", b"//"))):
+            return None
+        return line_start, line_end
+
+    def replacement(self, cloud_block: str) -> Tuple[int, int, str, bool]:
+        """
+        Return (start, end, text, needs_fmt): the byte range to replace and
+        its replacement. Where possible the range starts at the beginning of
+        the backend's first line, so the indentation is normalized and the
+        rewritten region matches `terraform fmt` output. `cloud_block` must
+        come from format_cloud_block(). needs_fmt is True when the block
+        shares its lines with other code (e.g. a one-line terraform block),
+        which only `terraform fmt` can lay out.
+        """
+        block = self.block
+        lines = self._own_lines()
+        if lines is None:
+            return block.start, block.end, cloud_block, True
+        return lines[0], block.end, HCL_INDENT + cloud_block, False
+
+    def removal(self) -> Tuple[int, int, str, bool]:
+        """
+        Like replacement(), but for deleting the backend block: its whole
+        lines where it has them to itself, otherwise just the block.
+        """
+        block = self.block
+        lines = self._own_lines()
+        if lines is None:
+            return block.start, block.end, "", True
+        return lines[0], min(lines[1] + 1, len(self.data)), "", False
+
+
+def parse_backend_regex(ws_info: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Regex fallback for when HCL2 parsing fails: return (organization, name,
+    prefix) from a remote backend body, ignoring commented lines.
+    """
+    org_m = re.search(r'(?m)^(?![\s]*#).*?\borganization\s+=\s+"(?P<val>[^"]+)"', ws_info)
+    name_m = re.search(r'(?m)^(?![\s]*#).*?\bname\s+=\s+"(?P<val>[^"]+)"', ws_info)
+    pref_m = re.search(r'(?m)^(?![\s]*#).*?\bprefix\s+=\s+"(?P<val>[^"]+)"', ws_info)
+
+    return (
+        org_m.group("val") if org_m else None,
+        name_m.group("val") if name_m else None,
+        pref_m.group("val") if pref_m else None,
+    )
+
+
+def splice(data: bytes, start: int, end: int, text: str) -> str:
+    """Return `data` with bytes [start, end) replaced by `text`, decoded."""
+    return (data[:start] + text.encode("utf-8") + data[end:]).decode("utf-8")
+
+
+def format_cloud_block(
+    organization: str,
+    workspace_attr: Tuple[str, str],
+    hostname: Optional[str] = None,
+    newline: str = "\n",
+) -> str:
+    """
+    Emit a `cloud` block already laid out the way `terraform fmt` would at
+    one level of nesting: two-space indents and `=` signs aligned across
+    consecutive attributes. `workspace_attr` is the (key, HCL value) pair
+    for the nested `workspaces` block. The first line carries no indent;
+    lines are joined with `newline`, the target file's line ending.
+    """
+    attrs = []
+    if hostname:
+        attrs.append(("hostname", f'"{hostname}"'))
+    attrs.append(("organization", f'"{organization}"'))
+    width = max(len(key) for key, _ in attrs)
+    inner = HCL_INDENT * 2
+    lines = ["cloud {"]
+    lines += [f"{inner}{key.ljust(width)} = {value}" for key, value in attrs]
+    lines += [
+        f"{inner}workspaces {{",
+        f"{inner}{HCL_INDENT}{workspace_attr[0]} = {workspace_attr[1]}",
+        f"{inner}}}",
+        f"{HCL_INDENT}}}",
+    ]
+    return newline.join(lines)
+
+
+class FileEdit:
+    """
+    One planned change to one file: replace bytes [start, end) of the
+    original (identified by its SHA-256) with `replacement`.
+    """
+
+    FIELDS = ("path", "sha256", "start", "end", "replacement", "needs_fmt")
+
+    def __init__(
+        self,
+        path: str,
+        sha256: Optional[str] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        replacement: Optional[str] = None,
+        needs_fmt: bool = False,
+        new_content: Optional[str] = None,
+        backup_path: Optional[str] = None,
+    ):
+        self.path = path
+        self.filename = os.path.basename(path)
+        self.sha256 = sha256
+        self.start = start
+        self.end = end
+        self.replacement = replacement
+        self.needs_fmt = needs_fmt
+        self.new_content = new_content
+        self.backup_path = backup_path
+
+    @classmethod
+    def from_file(
+        cls, tf_file: "TerraformFile", edit: Tuple[int, int, str, bool]
+    ) -> "FileEdit":
+        start, end, replacement, needs_fmt = edit
+        return cls(
+            tf_file.path,
+            hashlib.sha256(tf_file.data).hexdigest(),
+            start,
+            end,
+            replacement,
+            needs_fmt,
+            new_content=splice(tf_file.data, start, end, replacement),
+        )
+
+    def to_plan(self) -> dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def to_record(self) -> dict:
+        return {
+            "path": self.path,
+            "sha256": self.sha256,
+            "needs_fmt": self.needs_fmt,
+            "backup_path": self.backup_path,
+        }
+
+    @classmethod
+    def from_dict(cls, entry: dict) -> "FileEdit":
+        known = cls.FIELDS + ("backup_path",)
+        return cls(**{field: entry[field] for field in known if field in entry})
+
+
+class DirectoryPlan:
+    """
+    Everything needed to migrate one directory once it has been scanned: the
+    files to rewrite (the first gets the cloud block; duplicate backends in
+    the others are removed) and the workspace/tag to apply.
+    to_record()/from_record() round-trip it through the migration journal
+    (without the new content, which is already on disk by then);
+    to_plan()/from_plan() through an exported MigrationPlan, as byte ranges
+    of the original files (identified by their SHA-256) to replace.
+    """
+
+    RECORD_FIELDS = ("org", "workspace", "tag", "ws_config", "temp_backup")
+    PLAN_FIELDS = ("org", "workspace", "tag", "ws_config")
+
+    def __init__(
+        self,
+        folder: str,
+        edits: List[FileEdit],
+        org: str,
+        workspace: Optional[str],
+        tag: Optional[str],
+        ws_config: str,
+        temp_backup: bool = True,
+    ):
+        self.folder = folder
+        self.edits = edits
+        self.org = org
+        # Workspace to tag through the API (prefix-based backends only)
+        self.workspace = workspace
+        self.tag = tag
+        self.ws_config = ws_config
+        self.temp_backup = temp_backup
+
+    @property
+    def filename(self) -> str:
+        """The file(s) being migrated, for log messages."""
+        return ", ".join(edit.filename for edit in self.edits)
+
+    @property
+    def workspace_name(self) -> Optional[str]:
+        """The workspace init migrates state into: the named one, or `workspace`."""
+        if self.workspace:
+            return self.workspace
+        m = re.fullmatch(r'name = "(.*)"', self.ws_config)
+        return m.group(1) if m else None
+
+    def to_record(self) -> dict:
+        record = {field: getattr(self, field) for field in self.RECORD_FIELDS}
+        record["edits"] = [edit.to_record() for edit in self.edits]
+        return record
+
+    @classmethod
+    def from_record(cls, folder: str, record: dict) -> "DirectoryPlan":
+        if "edits" in record:
+            edits = [FileEdit.from_dict(e) for e in record["edits"]]
+        else:
+            # Journals written before directories could span several files
+            edits = [FileEdit.from_dict(record)]
+        return cls(
+            folder, edits, **{field: record.get(field) for field in cls.RECORD_FIELDS}
+        )
+
+    def to_plan(self) -> dict:
+        entry = {"folder": self.folder}
+        entry.update((field, getattr(self, field)) for field in self.PLAN_FIELDS)
+        entry["edits"] = [edit.to_plan() for edit in self.edits]
+        return entry
+
+    @classmethod
+    def from_plan(cls, entry: dict) -> "DirectoryPlan":
+        edits = [FileEdit.from_dict(e) for e in entry["edits"]]
+        return cls(
+            entry["folder"], edits, **{field: entry[field] for field in cls.PLAN_FIELDS}
+        )
+
+
+class PlanMismatchError(Exception):
+    """A planned file changed on disk after the plan was exported."""
+
+
+class MigrationPlan:
+    """
+    A versioned, machine-readable migration plan: for each directory, the
+    files to change (each with the byte range to replace, its replacement
+    text and the SHA-256 of the file it was computed from), and the org,
+    workspace and tag to apply.
+    Written with --plan-out during a dry run (one directory per line, sorted,
+    so plans diff and review well) and executed with --apply without
+    discovering or parsing anything again. Thread-safe to add() to.
+    """
+
+    VERSION = 2
+
+    def __init__(self, hostname: str, plans: Iterable[DirectoryPlan] = ()):
+        self.hostname = hostname
+        self.plans: Dict[str, DirectoryPlan] = {p.folder: p for p in plans}
+        self._lock = threading.Lock()
+
+    def add(self, plan: DirectoryPlan) -> None:
+        with self._lock:
+            self.plans[plan.folder] = plan
+
+    def __len__(self) -> int:
+        return len(self.plans)
+
+    def write(self, path: str) -> None:
+        """Write the plan atomically."""
+        with self._lock:
+            entries = [self.plans[folder].to_plan() for folder in sorted(self.plans)]
+        header = json.dumps(
+            {"version": self.VERSION, "hostname": self.hostname}, sort_keys=True
+        )
+        lines = ",\n".join(json.dumps(entry, sort_keys=True) for entry in entries)
+        parent = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=parent, prefix=".plan-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(f'{header[:-1]}, "directories": [\n{lines}\n]}}\n')
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "MigrationPlan":
+        """
+        Read a plan and check every planned file against its recorded hash,
+        computing each file's new content on the way. Raises ValueError for an
+        unreadable or unsupported plan and PlanMismatchError, listing every
+        changed file, before anything is applied.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                raw = json.load(f)
+            except ValueError as e:
+                raise ValueError(f"{path} is not a valid plan: {e}") from None
+        if raw.get("version") != cls.VERSION:
+            raise ValueError(
+                f"{path} has plan version {raw.get('version')!r}; "
+                f"this script reads version {cls.VERSION}"
+            )
+        plan = cls(
+            raw["hostname"], (DirectoryPlan.from_plan(e) for e in raw["directories"])
+        )
+        mismatched = []
+        for entry in plan.plans.values():
+            for edit in entry.edits:
+                try:
+                    with open(edit.path, "rb") as f:
+                        data = f.read()
+                except OSError as e:
+                    mismatched.append(f"{edit.path}: {e.strerror}")
+                    continue
+                if hashlib.sha256(data).hexdigest() != edit.sha256:
+                    mismatched.append(f"{edit.path}: changed since the plan was written")
+                    continue
+                edit.new_content = splice(data, edit.start, edit.end, edit.replacement)
+        if mismatched:
+            raise PlanMismatchError("\n".join(mismatched))
+        return plan
+
+
+# Journal stages in the order a directory passes through them
+JOURNAL_STAGES = ("scanned", "rewritten", "formatted", "initialized", "tagged", "done")
+# Stages after which files on disk have changed and work resumes mid-way
+RESUMABLE_STAGES = ("rewritten", "formatted", "initialized", "tagged")
+
+
+def read_journal(path: str) -> Dict[str, dict]:
+    """Each directory's merged journal records, latest stage last ({} if none)."""
+    state: Dict[str, dict] = {}
+    if not os.path.exists(path):
+        return state
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn final line from a crash
+            if "folder" in record:
+                state.setdefault(record["folder"], {}).update(record)
+    return state
+
+
+class MigrationJournal:
+    """
+    Append-only JSONL record of each directory's progress through the
+    migration stages (plus "skipped" for directories with nothing to do).
+    Every record is fsync'd before the stage is considered complete, so after
+    a crash or Ctrl-C the journal reflects exactly what finished. With
+    `resume`, status() returns the last recorded stage and plan for each
+    directory so finished work is skipped and half-done work continues.
+    Thread-safe.
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self.resume = resume
+        self._state: Dict[str, dict] = read_journal(path) if resume else {}
+        self._lock = threading.Lock()
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, folder: str, stage: str, **details) -> None:
+        entry = {"folder": folder, "stage": stage, "time": time.time(), **details}
+        line = json.dumps(entry, sort_keys=True)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._state.setdefault(folder, {}).update(entry)
+
+    def status(self, folder: str) -> Optional[dict]:
+        """Last known state of `folder` when resuming, else None."""
+        if not self.resume:
+            return None
+        with self._lock:
+            state = self._state.get(folder)
+            return dict(state) if state else None
+
+    def unfinished(self) -> List[str]:
+        """Directories a previous run left part-way through, when resuming."""
+        if not self.resume:
+            return []
+        with self._lock:
+            return [
+                folder
+                for folder, state in self._state.items()
+                if state["stage"] in RESUMABLE_STAGES
+            ]
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def _with_unfinished(
+    directories: Iterable[str], unfinished: List[str], root: Optional[str] = None
+) -> Iterator[str]:
+    """
+    Yield journaled directories left part-way through before the discovered
+    ones. Once rewritten they no longer contain a remote backend, so discovery
+    alone would not find them again. Only those at or under `root` (a -r run)
+    or, without one, among `directories` are taken, since the journal is
+    shared with runs against other trees.
+    """
+    if root is None:
+        directories = list(directories)
+        targets = set(directories)
+        unfinished = [d for d in unfinished if d in targets]
+    else:
+        root = os.path.abspath(root)
+        unfinished = [
+            d for d in unfinished if os.path.commonpath([root, d]) == root
+        ]
+    yield from unfinished
+    seen = set(unfinished)
+    for d in directories:
+        if d not in seen:
+            yield d
+
+
+def changed_targets(
+    since: str,
+    root: Optional[str] = None,
+    directories: Optional[List[str]] = None,
+    journal_path: Optional[str] = None,
+) -> List[str]:
+    """
+    The root modules under `root` (or those of `directories`) with .tf
+    changes since git ref `since`, minus directories the journal at
+    `journal_path` records as done. Raises GitDiffError.
+    """
+    if root is not None:
+        changed = discover_changed_root_modules(root, since)
+    else:
+        changed = [d for d in directories if d in changed_tf_directories(d, since)]
+    journal = read_journal(journal_path) if journal_path else {}
+    targets = [d for d in changed if journal.get(d, {}).get("stage") != "done"]
+    print(
+        f"🔎 SINCE: {len(changed)} changed directory(ies) since {since}, "
+        f"{len(changed) - len(targets)} already done in the journal"
+    )
+    return targets
+
+
+def plan_directory(
+    folder: str,
+    hostname: str,
+    parse_cache: Optional[ParseCache] = None,
+) -> Optional[DirectoryPlan]:
+    """
+    Scan a directory's .tf files and plan the rewrite of every file with a
+    remote backend: the first (in name order) gets the cloud block and the
+    others have their duplicate backend removed. Returns None if there is
+    nothing to migrate. Raises BackendConflictError if the backends disagree.
+    """
+    with _metrics.timed("discover", folder):
+        tf_files = discover_tf_files(folder)
+
+    if not tf_files:
+        print("  └─ No .tf files found in directory")
+        return None
+
+    files_with_backends: List[TerraformFile] = []
+    for filename in tf_files:
+        path = os.path.join(folder, filename)
+
+        try:
+            tf_file = TerraformFile.load(path, parse_cache)
+        except (OSError, PermissionError) as e:
+            print(f"  └─ Warning: Could not read {filename}: {e}")
+            continue
+
+        if tf_file.has_remote_backend:
+            files_with_backends.append(tf_file)
+
+    if not files_with_backends:
+        return None
+
+    # Every remote backend in the directory must agree; the first file gets
+    # the cloud block and the duplicates are removed from the others
+    settings = [tf_file.backend_settings() for tf_file in files_with_backends]
+    if len(set(settings)) > 1:
+        described = ", ".join(
+            f"{tf_file.filename} ({_describe_backend(*found)})"
+            for tf_file, found in zip(files_with_backends, settings)
+        )
+        raise BackendConflictError(f"Conflicting remote backends: {described}")
+    if len(files_with_backends) > 1:
+        names = [tf_file.filename for tf_file in files_with_backends]
+        print(f"  └─ Found {len(names)} files with the same remote backend: {', '.join(names)}")
+
+    org, name, prefix = settings[0]
+
+    # Validate we have required configuration
+    if not org:
+        return None
+
+    if name:
+        ws_attr = ("name", f'"{name}"')
+        ws_name_api = None
+        clean_tag = None
+    elif prefix:
+        clean_tag = prefix.strip("-")
+        ws_attr = ("tags", f'["{clean_tag}"]')
+        ws_name_api = Path(folder).resolve().name
+    else:
+        return None
+
+    # Emitted pre-formatted; terraform fmt is only needed as a fallback
+    primary, duplicates = files_with_backends[0], files_with_backends[1:]
+    cloud_block = format_cloud_block(
+        org,
+        ws_attr,
+        hostname if hostname != DEFAULT_HOSTNAME else None,
+        primary.newline,
+    )
+    edits = [FileEdit.from_file(primary, primary.replacement(cloud_block))]
+    edits += [FileEdit.from_file(tf_file, tf_file.removal()) for tf_file in duplicates]
+
+    return DirectoryPlan(
+        folder,
+        edits,
+        org,
+        ws_name_api,
+        clean_tag,
+        " = ".join(ws_attr),
+    )
+
+
+class BackendConflictError(ValueError):
+    """A directory's files declare remote backends that disagree."""
+
+
+def _restore_original(edit: FileEdit) -> bool:
+    """
+    Put back the original of a file whose rewrite was interrupted, if it was
+    changed and its .bak holds the original (checked against the SHA-256).
+    Returns True if the file was restored.
+    """
+    backup_path = f"{edit.path}.bak"
+    if not edit.sha256 or not os.path.exists(backup_path):
+        return False
+    with open(edit.path, "rb") as f:
+        if hashlib.sha256(f.read()).hexdigest() == edit.sha256:
+            return False
+    with open(backup_path, "rb") as f:
+        if hashlib.sha256(f.read()).hexdigest() != edit.sha256:
+            return False
+    shutil.copy2(backup_path, edit.path)
+    return True
+
+
+def _describe_backend(org: Optional[str], name: Optional[str], prefix: Optional[str]) -> str:
+    workspace = f"name={name}" if name else f"prefix={prefix}"
+    return f"organization={org}, {workspace}"
+
+
+def rewrite_files(plan: DirectoryPlan, backup: bool) -> None:
+    """
+    Back up every planned file and write the new contents as a set: all new
+    contents are staged next to their files first, then moved into place, so
+    a failure while writing leaves the originals untouched.
+    """
+    with _metrics.timed("rewrite", plan.folder):
+        plan.temp_backup = not backup  # Track if this is a temporary backup to clean up later
+        # Always create a temporary backup before making changes
+        for edit in plan.edits:
+            backup_path = f"{edit.path}.bak"
+            shutil.copy2(edit.path, backup_path)
+            edit.backup_path = backup_path
+
+        staged: List[Tuple[str, str]] = []
+        try:
+            for edit in plan.edits:
+                fd, tmp_path = tempfile.mkstemp(
+                    dir=os.path.dirname(edit.path), prefix=f".{edit.filename}.", suffix=".tmp"
+                )
+                staged.append((tmp_path, edit.path))
+                # newline="" keeps the file's own line endings as they are
+                with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+                    f.write(edit.new_content)
+                shutil.copymode(edit.path, tmp_path)
+        except BaseException:
+            for tmp_path, _ in staged:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+            raise
+        for tmp_path, path in staged:
+            os.replace(tmp_path, path)
+    for edit in plan.edits[1:]:
+        print(f"  └─ HCL: Removed duplicate backend from {edit.filename}")
+    print(f"  └─ HCL: Migrated {plan.edits[0].filename}")
+
+
+def format_files(plan: DirectoryPlan) -> None:
+    """
+    Format the files with terraform fmt where the rewrite couldn't be laid
+    out in-process.
+    """
+    for edit in plan.edits:
+        if not edit.needs_fmt:
+            continue
+        try:
+            with _metrics.timed("fmt", plan.folder):
+                subprocess.run(
+                    ["terraform", "fmt", edit.path],
+                    cwd=plan.folder,
+                    check=True,
+                    capture_output=True,
+                )
+            print(f"  └─ HCL: Formatted {edit.filename}")
+        except subprocess.CalledProcessError as e:
+            print(f"  └─ Warning: Could not format {edit.filename}: {e}")
+
+
+def init_directory(
+    plan: DirectoryPlan,
+    provider_cache: Optional[ProviderCache] = None,
+    init_timeout: Optional[int] = DEFAULT_INIT_TIMEOUT,
+    log_dir: Optional[str] = None,
+) -> None:
+    """Run terraform init to migrate state. Raises on failure."""
+    check_terraform_installed()
+    folder = plan.folder
+    # Run terraform init and answer "yes" when it asks to migrate state
+    # Note: -migrate-state flag is NOT compatible with Terraform Cloud migrations
+    # TFC requires interactive prompts, so we answer them on stdin instead
+    warming = (
+        provider_cache.warming(folder)
+        if provider_cache is not None
+        else contextlib.nullcontext()
+    )
+    log_path = init_log_path(log_dir, folder) if log_dir else None
+    if log_path:
+        print(f"  └─ Terraform: Logging init output to {log_path}")
+    with warming, _init_slots, _metrics.timed("init", folder):
+        returncode, _ = stream_process(
+            ["terraform", "init"],
+            cwd=folder,
+            log_path=log_path,
+            timeout=init_timeout or None,
+            env=provider_cache.env() if provider_cache is not None else None,
+        )
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, "terraform init")
+    print(f"  └─ Terraform: Initialized workspace and migrated state")
+
+
+def tag_workspace(
+    plan: DirectoryPlan,
+    client: Optional[TfcClient],
+    workspace_index: Optional[WorkspaceIndex] = None,
+    tag_batch: Optional[TagBatch] = None,
+) -> bool:
+    """
+    Add the plan's tag to its workspace (for prefix-based workspaces).
+    Returns True once nothing is left to do; False if the tag was deferred
+    to `tag_batch` or could not be applied.
+    """
+    if not (plan.workspace and plan.tag):
+        return True
+    if tag_batch is not None:
+        tag_batch.add(plan.org, plan.workspace, plan.tag, folder=plan.folder)
+        print(f"  └─ API: Queued tag '{plan.tag}' for '{plan.workspace}'")
+        return False
+    if client:
+        return ensure_tfc_tag(
+            client, plan.org, plan.workspace, plan.tag, workspace_index
+        )
+    return False
+
+
+def preflight_workspace(
+    plan: DirectoryPlan,
+    client: TfcClient,
+    workspace_index: Optional[WorkspaceIndex] = None,
+    tag_batch: Optional[TagBatch] = None,
+    create: bool = True,
+    dry_run: bool = False,
+) -> bool:
+    """
+    Make sure the workspace init will migrate state into exists, creating it
+    (with the plan's tag) unless `create` is False, and that it already has
+    the tag, so init neither prompts nor finds no workspace matching the
+    tags. With `tag_batch`, the tag goes through its shared bulk calls.
+    Returns False if the workspace is missing and may not be created.
+    Raises WorkspaceLookupError if the API calls fail.
+    """
+    name = plan.workspace_name
+    if not name:
+        return True
+    entry = find_workspace(client, plan.org, name, workspace_index)
+    if entry is None:
+        if dry_run:
+            print(f"  └─ [DRY RUN] Would create workspace '{name}' in '{plan.org}'")
+            return True
+        if not create:
+            print(f"  └─ ❌ ERROR: Workspace '{name}' not found in '{plan.org}'")
+            return False
+        tags = [plan.tag] if plan.tag else []
+        entry = create_tfc_workspace(client, plan.org, name, tags, workspace_index)
+    if not plan.tag or plan.tag in entry["tag-names"] or dry_run:
+        return True
+    if tag_batch is not None:
+        tagged = tag_batch.apply_now(plan.org, name, plan.tag)
+    else:
+        tagged = ensure_tfc_tag(client, plan.org, name, plan.tag, workspace_index)
+    if not tagged:
+        raise WorkspaceLookupError(f"Could not tag workspace '{name}'")
+    return True
+
+
+class DirectoryMigration:
+    """
+    One directory's migration, split into the steps the pipeline runs as
+    separate stages: scan() → preflight() → rewrite() → init() → tag() →
+    finish().
+    Each step returns True if the migration should continue to the next one.
+    A failing step restores the original file and sets `result` to None;
+    steps the journal records as complete are skipped when resuming.
+    """
+
+    def __init__(self, folder: str, journal: Optional[MigrationJournal] = None):
+        self.folder = folder
+        self.journal = journal
+        self.plan: Optional[DirectoryPlan] = None
+        self.stage: Optional[str] = None
+        self.result = False
+        # Set once preflight() has confirmed the workspace has its tag
+        self.tagged = False
+        # Captured output when run by the pipeline
+        self.log = io.StringIO()
+
+    def _reached(self, stage: str) -> None:
+        self.stage = stage
+        if self.journal is not None:
+            self.journal.record(self.folder, stage, **self.plan.to_record())
+
+    def _pending(self, stage: str) -> bool:
+        return JOURNAL_STAGES.index(self.stage) < JOURNAL_STAGES.index(stage)
+
+    def scan(
+        self,
+        hostname: str,
+        dry_run: bool,
+        parse_cache: Optional[ParseCache] = None,
+        workspace_index: Optional[WorkspaceIndex] = None,
+        planned: Optional[MigrationPlan] = None,
+        plan_out: Optional[MigrationPlan] = None,
+    ) -> bool:
+        """
+        Plan the migration, take it from an imported plan (`planned`), or
+        pick it up from the journal. New plans are also added to `plan_out`.
+        """
+        folder, journal = self.folder, self.journal
+        status = journal.status(folder) if journal is not None else None
+        if status and status["stage"] == "done":
+            print("  └─ Journal: Already migrated. Skipping.")
+            self.result = True
+            return False
+        if status and status["stage"] == "skipped":
+            print("  └─ Journal: Nothing to migrate in previous run. Skipping.")
+            return False
+
+        if status and status["stage"] in RESUMABLE_STAGES and not dry_run:
+            self.plan = DirectoryPlan.from_record(folder, status)
+            self.stage = status["stage"]
+            print(f"  └─ Journal: Resuming {self.plan.filename} after '{self.stage}'")
+            return True
+
+        if status and status["stage"] == "scanned" and not dry_run:
+            # Interrupted while writing; start again from the originals
+            for edit in DirectoryPlan.from_record(folder, status).edits:
+                if _restore_original(edit):
+                    print(f"  └─ Journal: Restored {edit.filename} before retrying")
+        if planned is not None:
+            self.plan = planned.plans.get(folder)
+        else:
+            try:
+                self.plan = plan_directory(folder, hostname, parse_cache)
+            except BackendConflictError as e:
+                print(f"  └─ ❌ ERROR: {e}")
+                print("  └─ ERROR: Make the backends agree, then run again")
+                self.result = None
+                return False
+            finally:
+                if parse_cache is not None:
+                    # One commit per directory rather than per file
+                    parse_cache.flush()
+        if self.plan is None:
+            print("  └─ No remote backend found. Skipping.")
+            if journal is not None and not dry_run:
+                journal.record(folder, "skipped")
+            return False
+        if plan_out is not None:
+            plan_out.add(self.plan)
+
+        if dry_run:
+            plan = self.plan
+            tag_msg = f" and add tag to '{plan.workspace}'" if plan.workspace else ""
+            print(
+                f"  └─ [DRY RUN] Would update {plan.filename} with host '{hostname}'"
+                f", {plan.ws_config}{tag_msg}"
+            )
+            if workspace_index is not None:
+                try:
+                    preflight_workspace(
+                        plan, workspace_index.client, workspace_index, dry_run=True
+                    )
+                except (requests.RequestException, WorkspaceLookupError) as e:
+                    print(f"  └─ Warning: {e}")
+            self.result = True
+            return False
+        self._reached("scanned")
+        return True
+
+    def preflight(
+        self,
+        client: Optional[TfcClient],
+        workspace_index: Optional[WorkspaceIndex] = None,
+        tag_batch: Optional[TagBatch] = None,
+        create_workspaces: bool = True,
+    ) -> bool:
+        """
+        Check (and create) the target workspace before any file is touched.
+        A failure leaves the directory as it was and sets `result` to None.
+        """
+        if client is None or not self._pending("rewritten"):
+            return True
+        try:
+            # No workspace is created for a run that could never init
+            check_terraform_installed()
+            with _metrics.timed("preflight", self.folder):
+                ready = preflight_workspace(
+                    self.plan, client, workspace_index, tag_batch, create_workspaces
+                )
+        except (
+            requests.RequestException,
+            WorkspaceLookupError,
+            TerraformNotFoundError,
+        ) as e:
+            print(f"  └─ ❌ ERROR: {e}")
+            ready = False
+        if not ready:
+            print("  └─ ERROR: No files were changed; fix the workspace or API access, then run again")
+            self.result = None
+            return False
+        self.tagged = True
+        return True
+
+    def rewrite(self, backup: bool) -> bool:
+        """Write the cloud block and format the file if needed."""
+        try:
+            # Checked before touching any file, since init will need it
+            check_terraform_installed()
+            if self._pending("rewritten"):
+                rewrite_files(self.plan, backup)
+                self._reached("rewritten")
+            if self._pending("formatted"):
+                format_files(self.plan)
+                self._reached("formatted")
+        except Exception as e:
+            return self.fail(e)
+        return True
+
+    def init(
+        self,
+        provider_cache: Optional[ProviderCache] = None,
+        init_timeout: Optional[int] = DEFAULT_INIT_TIMEOUT,
+        log_dir: Optional[str] = None,
+    ) -> bool:
+        """Run terraform init to migrate state."""
+        try:
+            if self._pending("initialized"):
+                init_directory(self.plan, provider_cache, init_timeout, log_dir)
+                self._reached("initialized")
+        except Exception as e:
+            return self.fail(e)
+        return True
+
+    def tag(
+        self,
+        client: Optional[TfcClient],
+        workspace_index: Optional[WorkspaceIndex] = None,
+        tag_batch: Optional[TagBatch] = None,
+    ) -> bool:
+        """Add the tag to the workspace (for prefix-based workspaces)."""
+        try:
+            with _metrics.timed("tag", self.folder):
+                tagged = self.tagged or tag_workspace(
+                    self.plan, client, workspace_index, tag_batch
+                )
+            if tagged:
+                if self.plan.tag:
+                    self._reached("tagged")
+                self._reached("done")
+        except Exception as e:
+            return self.fail(e)
+        return True
+
+    def finish(self) -> bool:
+        """Clean up after a successful migration."""
+        # If we made it here successfully and backup was temporary, clean it up
+        if self.plan.temp_backup:
+            for edit in self.plan.edits:
+                if not edit.backup_path:
+                    continue
+                try:
+                    os.remove(edit.backup_path)
+                except OSError:
+                    pass  # Ignore errors cleaning up temp backup
+        self.result = True
+        return True
+
+    def fail(self, e: Exception) -> bool:
+        """Restore the original files after a failed step. Returns False."""
+        plan = self.plan
+        self.result = None
+        print(f"  └─ ❌ ERROR: Migration failed for {plan.filename}")
+        print(f"  └─ ERROR: {type(e).__name__}: {e}")
+        backed_up = [edit for edit in plan.edits if edit.backup_path]
+        if not backed_up:
+            return False
+        print(f"  └─ Restoring original configuration from backup...")
+
+        restored = True
+        for edit in backed_up:
+            try:
+                shutil.copy2(edit.backup_path, edit.path)
+                print(f"  └─ ✓ Successfully restored {edit.filename} to original state")
+            except Exception as restore_error:
+                print(f"  └─ ❌ CRITICAL: Failed to restore backup: {restore_error}")
+                print(f"  └─ Original file is at: {edit.backup_path}")
+                restored = False
+        if not restored:
+            return False
+        if self.journal is not None:
+            # The originals are back in place; a resume starts from scratch
+            self.journal.record(self.folder, "restored")
+
+        # If backups were meant to be temporary, still keep them since migration failed
+        if plan.temp_backup:
+            for edit in backed_up:
+                print(f"  └─ Backup retained at: {edit.backup_path}")
+
+        return False
+
+
+def migrate_directory(
+    folder: str,
+    client: Optional[TfcClient],
+    hostname: str,
+    dry_run: bool,
+    backup: bool,
+    workspace_index: Optional[WorkspaceIndex] = None,
+    tag_batch: Optional[TagBatch] = None,
+    parse_cache: Optional[ParseCache] = None,
+    provider_cache: Optional[ProviderCache] = None,
+    init_timeout: Optional[int] = DEFAULT_INIT_TIMEOUT,
+    log_dir: Optional[str] = None,
+    journal: Optional[MigrationJournal] = None,
+    planned: Optional[MigrationPlan] = None,
+    plan_out: Optional[MigrationPlan] = None,
+    create_workspaces: bool = True,
+) -> bool:
+    """
+    Migrate remote backend to cloud block in discovered .tf files.
+    Scans all .tf files in the directory and rewrites every one with a remote
+    backend as one plan: the first gets the cloud block, the others lose their
+    duplicate backend, and a single terraform init follows.
+    With a journal, each completed stage is recorded; when resuming, finished
+    directories are skipped and interrupted ones continue from their last stage.
+    With `planned`, the directory's entry in that plan is applied instead.
+    With a client, the target workspace is checked (and, with
+    `create_workspaces`, created) before any file is rewritten.
+    Returns True if migrated, False if there was nothing to migrate and None
+    if it failed.
+    """
+    migration = DirectoryMigration(folder, journal)
+    if (
+        migration.scan(
+            hostname, dry_run, parse_cache, workspace_index, planned, plan_out
+        )
+        and migration.preflight(
+            client, workspace_index, tag_batch, create_workspaces
+        )
+        and migration.rewrite(backup)
+        and migration.init(provider_cache, init_timeout, log_dir)
+        and migration.tag(client, workspace_index, tag_batch)
+    ):
+        migration.finish()
+    return migration.result
+
+
+_STOP = object()
+
+
+class PipelineStage:
+    """
+    A pool of worker threads that takes DirectoryMigrations from a bounded
+    queue, runs one step on each and hands the ones that should continue to
+    the next stage. Records how many directories it processed, how long its
+    workers were busy and how deep its input queue got.
+    """
+
+    def __init__(self, name: str, step, workers: int, queue_size: int):
+        self.name = name
+        self.step = step
+        self.workers = workers
+        self.inbox: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.next: Optional["PipelineStage"] = None
+        self.on_done = None
+        self.processed = 0
+        self.busy = 0.0
+        self.max_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+        self._started = 0.0
+        self._elapsed = 0.0
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def start(self, stdout: _ThreadLocalStdout) -> None:
+        self._started = time.perf_counter()
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._work,
+                args=(stdout,),
+                name=f"{self.name}-{i}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def put(self, migration: DirectoryMigration) -> None:
+        # Blocks while the queue is full, so upstream stages can't run away
+        self.inbox.put(migration)
+        depth = self.inbox.qsize()
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+            self._depth_total += depth
+            self._depth_samples += 1
+
+    def close(self) -> None:
+        """Wait for queued work to drain and stop the workers."""
+        for _ in self._threads:
+            self.inbox.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._elapsed = time.perf_counter() - self._started
+
+    def _work(self, stdout: _ThreadLocalStdout) -> None:
+        while True:
+            migration = self.inbox.get()
+            if migration is _STOP:
+                return
+            if _interrupted.is_set():
+                # Draining after Ctrl-C: leave the rest for --resume
+                migration.log.write("  └─ Interrupted\n")
+                migration.result = None
+                self.on_done(migration)
+                continue
+            start = time.perf_counter()
+            stdout.start_capture(migration.log)
+            try:
+                proceed = self.step(migration)
+            except Exception as e:
+                print(f"  └─ ❌ ERROR: {type(e).__name__}: {e}")
+                migration.result = None
+                proceed = False
+            finally:
+                stdout.stop_capture()
+            with self._lock:
+                self.processed += 1
+                self.busy += time.perf_counter() - start
+            if proceed and self.next is not None:
+                self.next.put(migration)
+            else:
+                self.on_done(migration)
+
+    def stats(self) -> dict:
+        with self._lock:
+            elapsed = self._elapsed or (time.perf_counter() - self._started)
+            return {
+                "stage": self.name,
+                "workers": self.workers,
+                "processed": self.processed,
+                "per_second": self.processed / elapsed if elapsed else 0.0,
+                "utilization": (
+                    self.busy / (elapsed * self.workers) if elapsed else 0.0
+                ),
+                "max_queue": self.max_depth,
+                "mean_queue": (
+                    self._depth_total / self._depth_samples
+                    if self._depth_samples
+                    else 0.0
+                ),
+            }
+
+
+def print_pipeline_stats(stages: List[PipelineStage]) -> None:
+    """Print each stage's throughput, utilization and queue depth."""
+    print("\n=== Pipeline ===")
+    print(
+        f"  {'stage':<9} {'workers':>7} {'dirs':>6} {'dirs/s':>8} "
+        f"{'busy':>6} {'queue max':>9} {'queue avg':>9}"
+    )
+    for stage in stages:
+        s = stage.stats()
+        print(
+            f"  {s['stage']:<9} {s['workers']:>7} {s['processed']:>6} "
+            f"{s['per_second']:>8.2f} {s['utilization']:>6.0%} "
+            f"{s['max_queue']:>9} {s['mean_queue']:>9.1f}"
+        )
+
+
+# Report order for the stages timed by RunMetrics
+METRIC_STAGES = (
+    "discover",
+    "read",
+    "parse",
+    "preflight",
+    "rewrite",
+    "fmt",
+    "init",
+    "tag",
+    "api_get",
+    "api_post",
+)
+
+
+def _ordered_stages(summary: Dict[str, dict]) -> List[str]:
+    known = [stage for stage in METRIC_STAGES if stage in summary]
+    return known + sorted(set(summary) - set(known))
+
+
+def print_metrics(metrics: RunMetrics, slowest: int = 5) -> None:
+    """Print p50/p95/max per stage and the slowest directories."""
+    summary = metrics.summary()
+    if not summary:
+        return
+    print("\n=== Timings (seconds) ===")
+    print(
+        f"  {'stage':<9} {'count':>6} {'p50':>8} {'p95':>8} {'max':>8} {'total':>9}"
+    )
+    for stage in _ordered_stages(summary):
+        t = summary[stage]
+        print(
+            f"  {stage:<9} {t['count']:>6} {t['p50']:>8.3f} {t['p95']:>8.3f} "
+            f"{t['max']:>8.3f} {t['total']:>9.2f}"
+        )
+    folders = metrics.slowest(slowest)
+    if folders:
+        print("  Slowest directories:")
+        for folder, seconds in folders:
+            print(f"    {seconds:>8.2f}s {folder}")
+
+
+def api_counts(scheduler: Optional[RequestScheduler]) -> Dict[str, int]:
+    """Requests made, retried and throttled so far (zeros without a client)."""
+    return {
+        "requests": scheduler.requests if scheduler else 0,
+        "retries": scheduler.retries if scheduler else 0,
+        "throttled": scheduler.throttled if scheduler else 0,
+    }
+
+
+def write_metrics(
+    path: str,
+    metrics: RunMetrics,
+    results: List[Tuple[str, Optional[bool]]],
+    scheduler: Optional[RequestScheduler] = None,
+    stages: Optional[List[PipelineStage]] = None,
+) -> None:
+    """
+    Export the run's metrics to `path`: a Prometheus textfile if it ends in
+    .prom, JSON otherwise. Written atomically, as the node_exporter textfile
+    collector expects.
+    """
+    summary = metrics.summary()
+    outcomes = [result for _, result in results]
+    counts = {
+        "migrated": outcomes.count(True),
+        "skipped": outcomes.count(False),
+        "failed": outcomes.count(None),
+    }
+    api = api_counts(scheduler)
+    if path.endswith(".prom"):
+        lines = [
+            "# HELP tfc_migrator_stage_seconds Time spent in each migration stage.",
+            "# TYPE tfc_migrator_stage_seconds summary",
+        ]
+        for stage in _ordered_stages(summary):
+            t = summary[stage]
+            for q in ("p50", "p95"):
+                lines.append(
+                    f'tfc_migrator_stage_seconds{{stage="{stage}",'
+                    f'quantile="0.{q[1:]}"}} {t[q]:.6f}'
+                )
+            lines.append(f'tfc_migrator_stage_seconds_sum{{stage="{stage}"}} {t["total"]:.6f}')
+            lines.append(f'tfc_migrator_stage_seconds_count{{stage="{stage}"}} {t["count"]}')
+        lines += [
+            "# HELP tfc_migrator_stage_max_seconds Slowest single run of each stage.",
+            "# TYPE tfc_migrator_stage_max_seconds gauge",
+        ]
+        for stage in _ordered_stages(summary):
+            lines.append(
+                f'tfc_migrator_stage_max_seconds{{stage="{stage}"}} {summary[stage]["max"]:.6f}'
+            )
+        lines += [
+            "# HELP tfc_migrator_directories Directories by outcome.",
+            "# TYPE tfc_migrator_directories gauge",
+        ]
+        lines += [
+            f'tfc_migrator_directories{{result="{result}"}} {count}'
+            for result, count in counts.items()
+        ]
+        for name, value in api.items():
+            lines += [
+                f"# TYPE tfc_migrator_api_{name}_total counter",
+                f"tfc_migrator_api_{name}_total {value}",
+            ]
+        text = "\n".join(lines) + "\n"
+    else:
+        report = {
+            "stages": summary,
+            "slowest_directories": [
+                {"directory": folder, "seconds": seconds}
+                for folder, seconds in metrics.slowest(10)
+            ],
+            "directories": counts,
+            "api": api,
+        }
+        if stages:
+            report["pipeline"] = [stage.stats() for stage in stages]
+        text = json.dumps(report, indent=2, sort_keys=True) + "\n"
+
+    parent = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=parent, prefix=".metrics-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+def run_pipeline(
+    directories: Iterable[str],
+    jobs: int,
+    max_inits: int = DEFAULT_MAX_INITS,
+    client: Optional[TfcClient] = None,
+    hostname: str = DEFAULT_HOSTNAME,
+    dry_run: bool = True,
+    backup: bool = False,
+    workspace_index: Optional[WorkspaceIndex] = None,
+    tag_batch: Optional[TagBatch] = None,
+    parse_cache: Optional[ParseCache] = None,
+    provider_cache: Optional[ProviderCache] = None,
+    init_timeout: Optional[int] = DEFAULT_INIT_TIMEOUT,
+    log_dir: Optional[str] = None,
+    journal: Optional[MigrationJournal] = None,
+    planned: Optional[MigrationPlan] = None,
+    plan_out: Optional[MigrationPlan] = None,
+    create_workspaces: bool = True,
+) -> Tuple[List[Tuple[str, Optional[bool]]], List[PipelineStage]]:
+    """
+    Migrate directories through a pipeline of stages connected by bounded
+    queues: scan (plan the rewrite, `jobs` workers), preflight (check and
+    create workspaces, `jobs` workers), rewrite (write and format, `jobs`
+    workers), init (`max_inits` workers) and tag (`jobs` workers). Cheap
+    scanning runs ahead while slow inits and API calls are limited separately.
+    `directories` may be a lazy iterator; each directory enters the pipeline
+    as soon as it is yielded. Each directory's log is printed as one block when
+    it leaves the pipeline; results are returned as (directory, result) in
+    input order along with the stages for reporting.
+    """
+    stages = [
+        PipelineStage(
+            "scan",
+            lambda m: m.scan(
+                hostname, dry_run, parse_cache, workspace_index, planned, plan_out
+            ),
+            jobs,
+            2 * jobs,
+        ),
+        PipelineStage(
+            "preflight",
+            lambda m: m.preflight(
+                client, workspace_index, tag_batch, create_workspaces
+            ),
+            jobs,
+            2 * jobs,
+        ),
+        PipelineStage("rewrite", lambda m: m.rewrite(backup), jobs, 2 * jobs),
+        PipelineStage(
+            "init",
+            lambda m: m.init(provider_cache, init_timeout, log_dir),
+            max_inits,
+            2 * max_inits,
+        ),
+        PipelineStage(
+            "tag",
+            lambda m: m.tag(client, workspace_index, tag_batch) and m.finish(),
+            jobs,
+            2 * jobs,
+        ),
+    ]
+    stdout = _ThreadLocalStdout(sys.stdout)
+    print_lock = threading.Lock()
+
+    def emit(migration: DirectoryMigration) -> None:
+        with print_lock:
+            print(migration.log.getvalue(), end="", flush=True)
+
+    for stage, following in zip(stages, stages[1:] + [None]):
+        stage.next = following
+        stage.on_done = emit
+
+    submitted = []
+    sys.stdout = stdout
+    try:
+        for stage in stages:
+            stage.start(stdout)
+        for d in directories:
+            migration = DirectoryMigration(d, journal)
+            migration.log.write(f"\n--- {d} ---\n")
+            submitted.append(migration)
+            stages[0].put(migration)
+        for stage in stages:
+            stage.close()
+    except KeyboardInterrupt:
+        # Kill in-flight inits so their directories are restored, then let
+        # the workers finish what they hold before giving up
+        kill_running_processes()
+        for stage in stages:
+            stage.close()
+        raise
+    finally:
+        sys.stdout = stdout._stream
+    return [(m.folder, m.result) for m in submitted], stages
+
+
+def run_migrations(
+    directories: Iterable[str],
+    jobs: int,
+    max_inits: int = DEFAULT_MAX_INITS,
+    **migrate_kwargs,
+) -> Tuple[List[Tuple[str, Optional[bool]]], Optional[List[PipelineStage]]]:
+    """
+    Migrate `directories` one at a time, or through run_pipeline() when
+    jobs > 1, then apply any deferred tags. `migrate_kwargs` are passed to
+    migrate_directory(). Returns the (directory, result) pairs and the
+    pipeline stages (None for a serial run).
+    """
+    if jobs > 1:
+        results, stages = run_pipeline(
+            directories, jobs, max_inits=max_inits, **migrate_kwargs
+        )
+    else:
+        results, stages = [], None
+        for d in directories:
+            print(f"\n--- {d} ---")
+            results.append((d, migrate_directory(d, **migrate_kwargs)))
+
+    tag_batch = migrate_kwargs.get("tag_batch")
+    journal = migrate_kwargs.get("journal")
+    if tag_batch is not None:
+        failed = tag_batch.apply(jobs=jobs)
+        if failed:
+            print(f"  └─ ❌ ERROR: {failed} deferred tag(s) could not be applied")
+        elif journal is not None:
+            for folder in tag_batch.folders:
+                journal.record(folder, "tagged")
+                journal.record(folder, "done")
+    return results, stages
+
+
+RESULT_LABELS = {True: "migrated", False: "skipped", None: "failed"}
+
+
+def print_summary(results: List[Tuple[str, Optional[bool]]]) -> None:
+    """Print a per-directory summary in input order."""
+    outcomes = [result for _, result in results]
+    print("\n=== Summary ===")
+    for d, result in results:
+        print(f"  {RESULT_LABELS[result]:<8} {d}")
+    print(
+        f"  {outcomes.count(True)} migrated, {outcomes.count(False)} skipped, "
+        f"{outcomes.count(None)} failed"
+    )
+
+
+def plugin_cache_dir(args) -> Optional[str]:
+    """The shared TF_PLUGIN_CACHE_DIR for this run, or None if disabled."""
+    if args.no_plugin_cache:
+        return None
+    return os.path.abspath(
+        args.plugin_cache_dir
+        or os.getenv("TF_PLUGIN_CACHE_DIR")
+        or os.path.join(cache_home(), "plugin-cache")
+    )
+
+
+class JobError(ValueError):
+    """A --serve request that cannot be run as given."""
+
+
+class MigrationServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Resident migrator for --serve, taking jobs as JSON on a Unix socket.
+    The TFC client and its keep-alive connections, the workspace index, the
+    parse cache, the provider cache, the hcl2 grammar and the terraform check
+    are set up once and reused by every job, so a job costs only the work
+    its directories need. Jobs run one at a time, since each captures the
+    process's stdout and timings; within a job, --jobs still migrates
+    directories concurrently. The socket is only accessible to its owner.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: str, args, token: Optional[str], hostname: str):
+        if os.path.exists(path):
+            # Reuse the path only if no server is still answering on it
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.remove(path)
+            else:
+                raise OSError(f"another server is listening on {path}")
+            finally:
+                probe.close()
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(path, _ServeHandler)
+        finally:
+            os.umask(old_umask)
+        self.path = path
+        self.hostname = hostname
+        self.jobs = args.jobs
+        self.max_inits = args.max_inits
+        self.init_timeout = args.init_timeout
+        self.journal_path = journal_path(args)
+        self.log_dir = os.path.abspath(args.log_dir or os.path.join(cache_home(), "logs"))
+        os.makedirs(self.log_dir, exist_ok=True)
+        pool_size = max(args.jobs, DEFAULT_API_POOL_SIZE)
+        self.client = (
+            TfcClient(
+                hostname,
+                token,
+                pool_size=pool_size,
+                scheduler=RequestScheduler(args.api_rate, max_concurrency=pool_size),
+                scheme=args.api_scheme,
+            )
+            if token
+            else None
+        )
+        self.workspace_index = (
+            WorkspaceIndex(self.client, max_age=SERVE_INDEX_MAX_AGE)
+            if self.client and (args.prefetch_workspaces or args.defer_tags)
+            else None
+        )
+        self.defer_tags = args.defer_tags
+        self.create_workspaces = not args.no_create_workspaces
+        self.parse_cache = None
+        if not args.no_cache:
+            try:
+                self.parse_cache = ParseCache(default_cache_path())
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️ Parse cache disabled: {e}")
+        self.provider_cache = ProviderCache(plugin_cache_dir(args))
+        self.started = time.time()
+        self.served = 0
+        self._closing = False
+        self._job_lock = threading.Lock()
+
+    def run_job(self, request: dict) -> dict:
+        """Answer one request: `ping`, `shutdown` or (the default) `migrate`."""
+        op = request.get("op", "migrate")
+        if op == "ping":
+            return {
+                "ok": True,
+                "pid": os.getpid(),
+                "hostname": self.hostname,
+                "uptime": time.time() - self.started,
+                "jobs": self.served,
+            }
+        if op == "shutdown":
+            # shutdown() waits for serve_forever(), so it can't run on this thread
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {"ok": True}
+        if op != "migrate":
+            return {"ok": False, "error": f"unknown op {op!r}"}
+        with self._job_lock:
+            if self._closing:
+                return {"ok": False, "error": "server is shutting down"}
+            return self._migrate(request)
+
+    def _targets(self, request: dict) -> Tuple[Iterable[str], Optional[MigrationPlan], bool]:
+        """Resolve a request's directories, imported plan and dry-run flag."""
+        cwd = request.get("cwd") or os.getcwd()
+
+        def resolve(path) -> str:
+            if not isinstance(path, str):
+                raise JobError(f"expected a path, got {path!r}")
+            return os.path.abspath(os.path.join(cwd, path))
+
+        hostname = request.get("hostname")
+        if hostname and hostname != self.hostname:
+            raise JobError(f"this server migrates to {self.hostname}, not {hostname}")
+        apply, recursive = request.get("apply"), request.get("recursive")
+        directories = request.get("directories")
+        if sum(1 for target in (apply, recursive, directories) if target) != 1:
+            raise JobError("give exactly one of 'directories', 'recursive' or 'apply'")
+
+        planned = None
+        if apply:
+            try:
+                planned = MigrationPlan.load(resolve(apply))
+            except PlanMismatchError as e:
+                raise JobError(f"{apply} no longer matches the files on disk:\n{e}")
+            except (OSError, ValueError, KeyError) as e:
+                raise JobError(f"could not read plan {apply}: {e}")
+            if planned.hostname != self.hostname:
+                raise JobError(f"{apply} was planned for {planned.hostname}, not {self.hostname}")
+            directories = sorted(planned.plans)
+        elif recursive:
+            directories = discover_root_modules(resolve(recursive))
+        elif isinstance(directories, list):
+            directories = [resolve(d) for d in directories]
+        else:
+            raise JobError("'directories' must be a list of paths")
+        since = request.get("since")
+        if since and planned is not None:
+            raise JobError("'since' cannot be combined with 'apply'")
+        if since:
+            try:
+                directories = changed_targets(
+                    since,
+                    root=resolve(recursive) if recursive else None,
+                    directories=None if recursive else directories,
+                    journal_path=self.journal_path,
+                )
+            except GitDiffError as e:
+                raise JobError(f"could not list changes since {since}: {e}")
+
+        dry_run = planned is None and bool(request.get("dry_run", True))
+        if not dry_run and self.client is None:
+            raise JobError("the server has no TFC token; start it with --token or TFC_TOKEN")
+        return directories, planned, dry_run
+
+    def _migrate(self, request: dict) -> dict:
+        global _metrics
+        start = time.perf_counter()
+        output = io.StringIO()
+        scheduler = self.client.scheduler if self.client is not None else None
+        api_before = api_counts(scheduler)
+        _metrics = RunMetrics()
+        journal = None
+        self.served += 1
+        try:
+            with contextlib.redirect_stdout(output):
+                directories, planned, dry_run = self._targets(request)
+                if dry_run:
+                    print("💡 MODE: DRY RUN (no changes will be saved)")
+                print(f"🌐 TARGET HOST: {self.hostname}")
+                plan_path = request.get("plan_out")
+                if plan_path:
+                    plan_path = os.path.abspath(
+                        os.path.join(request.get("cwd") or os.getcwd(), plan_path)
+                    )
+                plan_out = MigrationPlan(self.hostname) if plan_path else None
+                if not dry_run:
+                    try:
+                        check_terraform_installed()
+                    except TerraformNotFoundError as e:
+                        raise JobError(str(e))
+                    journal = MigrationJournal(
+                        self.journal_path, resume=bool(request.get("resume"))
+                    )
+                    if journal.resume:
+                        recursive = request.get("recursive")
+                        directories = _with_unfinished(
+                            directories,
+                            journal.unfinished(),
+                            root=(
+                                os.path.join(request.get("cwd") or os.getcwd(), recursive)
+                                if recursive
+                                else None
+                            ),
+                        )
+                results, stages = run_migrations(
+                    directories,
+                    self.jobs,
+                    max_inits=self.max_inits,
+                    client=self.client,
+                    hostname=self.hostname,
+                    dry_run=dry_run,
+                    backup=bool(request.get("backup")),
+                    workspace_index=self.workspace_index,
+                    tag_batch=(
+                        TagBatch(self.client, self.workspace_index)
+                        if self.workspace_index and self.defer_tags
+                        else None
+                    ),
+                    parse_cache=self.parse_cache if planned is None else None,
+                    provider_cache=self.provider_cache,
+                    init_timeout=self.init_timeout,
+                    log_dir=self.log_dir,
+                    journal=journal,
+                    planned=planned,
+                    plan_out=plan_out,
+                    create_workspaces=self.create_workspaces,
+                )
+                if plan_out is not None:
+                    plan_out.write(plan_path)
+                    print(f"\n📋 PLAN: Wrote {len(plan_out)} directory(ies) to {plan_path}")
+                print_summary(results)
+                if stages is not None:
+                    print_pipeline_stats(stages)
+                print_metrics(_metrics)
+        except Exception as e:
+            error = str(e) if isinstance(e, JobError) else f"{type(e).__name__}: {e}"
+            print(f"📨 JOB {self.served}: ❌ {error}")
+            return {"ok": False, "error": error, "output": output.getvalue()}
+        finally:
+            if journal is not None:
+                journal.close()
+
+        outcomes = [result for _, result in results]
+        api_after = api_counts(scheduler)
+        response = {
+            "ok": True,
+            "dry_run": dry_run,
+            "results": [
+                {"directory": d, "result": RESULT_LABELS[result]} for d, result in results
+            ],
+            "migrated": outcomes.count(True),
+            "skipped": outcomes.count(False),
+            "failed": outcomes.count(None),
+            "api": {name: api_after[name] - api_before[name] for name in api_after},
+            "stages": _metrics.summary(),
+            "seconds": time.perf_counter() - start,
+            "output": output.getvalue(),
+        }
+        print(
+            f"📨 JOB {self.served}: {len(results)} directory(ies), "
+            f"{response['migrated']} migrated, {response['failed']} failed "
+            f"in {response['seconds']:.2f}s"
+        )
+        return response
+
+    def server_close(self) -> None:
+        super().server_close()
+        with contextlib.suppress(OSError):
+            os.remove(self.path)
+        # Let a running job finish before its caches go away
+        with self._job_lock:
+            self._closing = True
+            if self.parse_cache is not None:
+                self.parse_cache.close()
+            if self.client is not None:
+                self.client.close()
+
+
+class _ServeHandler(socketserver.StreamRequestHandler):
+    """One JSON request per line in, one JSON response per line out."""
+
+    server: MigrationServer
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("expected a JSON object")
+            except ValueError as e:
+                response = {"ok": False, "error": f"invalid request: {e}"}
+            else:
+                response = self.server.run_job(request)
+            try:
+                self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return  # the client went away; the job itself has finished
+
+
+def serve(args) -> None:
+    """Run the --serve daemon until SIGTERM, Ctrl-C or a `shutdown` request."""
+    token = args.token or os.getenv("TFC_TOKEN")
+    hostname = args.hostname or os.getenv("TFC_HOSTNAME") or DEFAULT_HOSTNAME
+    path = os.path.abspath(args.serve)
+    try:
+        server = MigrationServer(path, args, token, hostname)
+    except OSError as e:
+        print(f"❌ ERROR: Cannot serve on {path}: {e}")
+        sys.exit(1)
+    set_max_inits(args.max_inits)
+    # Build the grammar now rather than in the first job
+    _prepare_hcl2()
+    set_parse_workers(args.parse_workers)
+    signal.signal(
+        signal.SIGTERM,
+        lambda signum, frame: threading.Thread(target=server.shutdown, daemon=True).start(),
+    )
+    print(f"🌐 TARGET HOST: {hostname}")
+    if not token:
+        print("💡 MODE: No TFC token, so only dry runs are accepted")
+    print(f"📡 SERVE: Listening on {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        set_parse_workers(0)
+        print(f"📡 SERVE: Stopped after {server.served} job(s)")
+
+
+def submit_job(path: str, request: dict) -> dict:
+    """Send one request to a --serve daemon and wait for its response."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError("the server closed the connection without answering")
+    return json.loads(line)
+
+
+def connect(args) -> None:
+    """Run this invocation on the --serve daemon at args.connect."""
+    request = {
+        "op": "migrate",
+        "cwd": os.getcwd(),
+        "dry_run": not args.no_dry_run,
+        "backup": bool(args.backup),
+        "resume": bool(args.resume),
+    }
+    if args.hostname:
+        request["hostname"] = args.hostname
+    if args.plan_out:
+        request["plan_out"] = args.plan_out
+    if args.since:
+        request["since"] = args.since
+    if args.apply:
+        request["apply"] = args.apply
+        scope = f"the migrations planned in {args.apply}"
+    elif args.recursive:
+        request["recursive"] = args.recursive
+        scope = f"all root modules under {os.path.abspath(args.recursive)}"
+    else:
+        request["directories"] = args.directories or DEFAULT_TARGET_DIRECTORIES
+        scope = f"{len(request['directories'])} migration(s)"
+
+    if args.no_dry_run:
+        confirm = input(f"\n⚠️ Proceed with {scope}? Type 'YES': ")
+        if confirm != "YES":
+            sys.exit(0)
+
+    try:
+        response = submit_job(args.connect, request)
+    except (OSError, ValueError) as e:
+        print(f"❌ ERROR: No answer from the server at {args.connect}: {e}")
+        sys.exit(1)
+    print(response.get("output", ""), end="")
+    if not response.get("ok"):
+        print(f"❌ ERROR: {response.get('error')}")
+        sys.exit(1)
 
 
 def main() -> None:
     args = parse_args()
-    check_terraform_installed()
-    token, hostname, directories = get_config(args)
+    if args.serve:
+        serve(args)
+        return
+    if args.connect:
+        connect(args)
+        return
+    token, hostname, directories, planned = get_config(args)
     dry_run = not args.no_dry_run
+    pool_size = max(args.jobs, DEFAULT_API_POOL_SIZE)
+    client = (
+        TfcClient(
+            hostname,
+            token,
+            pool_size=pool_size,
+            scheduler=RequestScheduler(args.api_rate, max_concurrency=pool_size),
+            scheme=args.api_scheme,
+        )
+        if token
+        else None
+    )
+    workspace_index = (
+        WorkspaceIndex(client)
+        if client and (args.prefetch_workspaces or args.defer_tags)
+        else None
+    )
+    tag_batch = (
+        TagBatch(client, workspace_index)
+        if workspace_index and args.defer_tags
+        else None
+    )
+    journal = None
+    plan_out = MigrationPlan(hostname) if args.plan_out else None
+    parse_cache = None
+    if not args.no_cache and planned is None:
+        try:
+            parse_cache = ParseCache(default_cache_path())
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ Parse cache disabled: {e}")
+    migrate_kwargs = dict(
+        client=client,
+        hostname=hostname,
+        dry_run=dry_run,
+        backup=bool(args.backup),
+        workspace_index=workspace_index,
+        tag_batch=tag_batch,
+        parse_cache=parse_cache,
+        planned=planned,
+        plan_out=plan_out,
+        create_workspaces=not args.no_create_workspaces,
+    )
 
     if not dry_run:
-        confirm = input(
-            f"\n⚠️ Proceed with {len(directories)} migration(s)? Type 'YES': "
+        scope = (
+            f"all root modules under {os.path.abspath(args.recursive)}"
+            if args.recursive and not args.since
+            else f"{len(directories)} migration(s)"
         )
+        confirm = input(f"\n⚠️ Proceed with {scope}? Type 'YES': ")
         if confirm != "YES":
             sys.exit(0)
 
-    for d in directories:
-        print(f"\n--- {d} ---")
-        if not migrate_directory(
-            d, token, hostname, dry_run, backup=bool(args.backup)
-        ):
-            print("  └─ No remote backend found. Skipping.")
+        try:
+            check_terraform_installed()
+        except TerraformNotFoundError as e:
+            print(f"❌ ERROR: {e}")
+            sys.exit(1)
+
+        cli_config = None
+        if args.provider_mirror:
+            # The mirror needs every lock file up front
+            directories = list(directories)
+            try:
+                cli_config = build_provider_mirror(directories, args.provider_mirror)
+            except subprocess.CalledProcessError as e:
+                print(f"❌ ERROR: Could not build provider mirror: {e.stderr or e}")
+                sys.exit(1)
+        migrate_kwargs["provider_cache"] = ProviderCache(
+            plugin_cache_dir(args), cli_config
+        )
+        log_dir = os.path.abspath(args.log_dir or os.path.join(cache_home(), "logs"))
+        os.makedirs(log_dir, exist_ok=True)
+        migrate_kwargs["log_dir"] = log_dir
+        migrate_kwargs["init_timeout"] = args.init_timeout
+        journal = MigrationJournal(journal_path(args), resume=args.resume)
+        migrate_kwargs["journal"] = journal
+        if args.resume:
+            directories = _with_unfinished(
+                directories, journal.unfinished(), root=args.recursive
+            )
+
+    if args.jobs > 1:
+        set_max_inits(args.max_inits)
+    set_parse_workers(args.parse_workers)
+    try:
+        results, stages = run_migrations(
+            directories, args.jobs, max_inits=args.max_inits, **migrate_kwargs
+        )
+    except KeyboardInterrupt:
+        kill_running_processes()
+        print("\n🛑 Interrupted; stopped any running terraform init")
+        if journal is not None:
+            journal.close()
+            print("  └─ Run again with --resume to continue")
+        sys.exit(130)
+    finally:
+        pool = _parse_pool
+        set_parse_workers(0)
+    if pool is not None and pool.parsed:
+        print(
+            f"\n🧮 PARSE: {pool.parsed} block(s) in {pool.chunks} chunk(s) "
+            f"across {pool.workers} worker process(es)"
+        )
+
+    if journal is not None:
+        journal.close()
+
+    if plan_out is not None:
+        plan_out.write(args.plan_out)
+        print(f"\n📋 PLAN: Wrote {len(plan_out)} directory(ies) to {args.plan_out}")
+
+    if stages is not None:
+        print_summary(results)
+        print_pipeline_stats(stages)
+
+    if parse_cache is not None:
+        parse_cache.close()
+
+    if client is not None and client.scheduler.requests:
+        sched = client.scheduler
+        print(
+            f"\n🌐 API: {sched.requests} request(s), {sched.retries} retried, "
+            f"{sched.throttled} rate-limited"
+        )
+
+    print_metrics(_metrics)
+    if args.metrics_out:
+        write_metrics(
+            args.metrics_out,
+            _metrics,
+            results,
+            client.scheduler if client is not None else None,
+            stages,
+        )
+        print(f"\n📈 METRICS: Wrote {args.metrics_out}")
 
 
 if __name__ == "__main__":
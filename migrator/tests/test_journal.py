@@ -0,0 +1,101 @@
+"""
+The migration journal and --resume: replaying a half-done directory from its
+last recorded stage, and only resuming directories the run was asked about.
+
+Run from the repository root or migrator/:
+    python3 -m pytest migrator/tests
+"""
+import importlib.util
+import os
+
+import pytest
+
+SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrate_tfc.py"
+)
+
+
+@pytest.fixture(scope="module")
+def mt():
+    spec = importlib.util.spec_from_file_location("migrate_tfc_journal", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+MAIN_TF = '''terraform {
+  backend "remote" {
+    organization = "acme"
+    workspaces {
+      name = "app"
+    }
+  }
+}
+'''
+
+
+@pytest.fixture
+def stack(tmp_path):
+    folder = tmp_path / "app"
+    folder.mkdir()
+    (folder / "main.tf").write_text(MAIN_TF)
+    return str(folder)
+
+
+def test_torn_final_line_is_ignored(mt, tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text(
+        '{"folder": "/a", "stage": "scanned"}\n'
+        '{"folder": "/a", "stage": "rewritten"}\n'
+        '{"folder": "/b", "sta'
+    )
+    state = mt.read_journal(str(path))
+    assert list(state) == ["/a"]
+    assert state["/a"]["stage"] == "rewritten"
+
+
+def test_resume_continues_after_last_stage(mt, stack, tmp_path, monkeypatch):
+    journal_file = str(tmp_path / "journal.jsonl")
+    plan = mt.plan_directory(stack, mt.DEFAULT_HOSTNAME)
+    first = mt.MigrationJournal(journal_file)
+    mt.rewrite_files(plan, backup=False)
+    first.record(stack, "formatted", **plan.to_record())
+    first.close()
+    rewritten = open(os.path.join(stack, "main.tf")).read()
+
+    inits = []
+    monkeypatch.setattr(mt, "_terraform_error", "")
+    monkeypatch.setattr(mt, "init_directory", lambda plan, *a: inits.append(plan.folder))
+    journal = mt.MigrationJournal(journal_file, resume=True)
+    assert journal.unfinished() == [stack]
+    result = mt.migrate_directory(
+        stack, None, mt.DEFAULT_HOSTNAME, dry_run=False, backup=False, journal=journal
+    )
+    journal.close()
+
+    assert result is True
+    assert inits == [stack]
+    assert open(os.path.join(stack, "main.tf")).read() == rewritten
+    assert not os.path.exists(os.path.join(stack, "main.tf.bak"))
+    assert mt.read_journal(journal_file)[stack]["stage"] == "done"
+
+    # A second resume finds nothing left to do
+    journal = mt.MigrationJournal(journal_file, resume=True)
+    assert journal.unfinished() == []
+    assert mt.migrate_directory(
+        stack, None, mt.DEFAULT_HOSTNAME, dry_run=False, backup=False, journal=journal
+    ) is True
+    journal.close()
+    assert inits == [stack]
+
+
+def test_resume_only_requested_directories(mt):
+    unfinished = ["/other/x", "/repo/b", "/repo-two/c"]
+    resumed = list(mt._with_unfinished(["/repo/a", "/repo/b"], unfinished))
+    assert resumed == ["/repo/b", "/repo/a"]
+
+
+def test_resume_only_under_requested_root(mt):
+    unfinished = ["/other/x", "/repo/b/c", "/repo-two/c"]
+    resumed = list(mt._with_unfinished(iter(["/repo/a"]), unfinished, root="/repo"))
+    assert resumed == ["/repo/b/c", "/repo/a"]
@@ -0,0 +1,115 @@
+"""
+Behaviour of locate_remote_backend(), the lexer that replaced the
+REMOTE_BACKEND_RE regex in both migrate_tfc.py scripts.
+
+Run from the repository root or migrator/:
+    python3 -m pytest migrator/tests
+"""
+import importlib.util
+import os
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS = {
+    "migrator": os.path.join(os.path.dirname(TESTS_DIR), "migrate_tfc.py"),
+    "root": os.path.join(os.path.dirname(os.path.dirname(TESTS_DIR)), "migrate_tfc.py"),
+}
+
+
+def _load(name: str, path: str):
+    spec = importlib.util.spec_from_file_location(f"migrate_tfc_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(params=sorted(SCRIPTS), scope="module")
+def locate(request):
+    return _load(request.param, SCRIPTS[request.param]).locate_remote_backend
+
+
+BACKEND = '''backend "remote" {
+    organization = "acme"
+    workspaces {
+      prefix = "net-"
+    }
+  }'''
+
+
+def located(locate, text: str) -> str:
+    """The backend block text found in `text`."""
+    block = locate(text)
+    assert block is not None
+    assert text[block.terraform_start:].startswith("terraform")
+    assert text[block.terraform_end - 1] == "}"
+    return text[block.start:block.end]
+
+
+def test_nested_workspaces_block(locate):
+    text = f'terraform {{\n  required_version = ">= 1.4"\n  {BACKEND}\n}}\n'
+    block = locate(text)
+    assert text[block.start:block.end] == BACKEND
+    body = text[block.body_start:block.body_end]
+    assert "workspaces {" in body and body.rstrip().endswith("}")
+    assert block.terraform_end == len(text) - 1
+
+
+def test_one_line_terraform_block(locate):
+    text = 'terraform { backend "remote" { organization = "acme" } }\n'
+    assert located(locate, text) == 'backend "remote" { organization = "acme" }'
+
+
+def test_heredoc_mentions_are_ignored(locate):
+    text = (
+        'locals {\n  doc = <<-EOT\n    terraform {\n      backend "remote" {\n'
+        '    }\n  EOT\n}\n'
+        f"terraform {{\n  {BACKEND}\n}}\n"
+    )
+    assert located(locate, text) == BACKEND
+
+
+def test_template_braces_in_strings(locate):
+    text = (
+        'locals {\n  a = "${jsonencode({ x = "}" })}"\n'
+        '  b = "%{ if true }{%{ endif }"\n}\n'
+        f'terraform {{\n  required_version = "${{"}}"}}"\n  {BACKEND}\n}}\n'
+    )
+    assert located(locate, text) == BACKEND
+
+
+def test_comments_with_braces(locate):
+    text = (
+        "# terraform { backend \"remote\" {\n"
+        "terraform {\n"
+        "  // }\n"
+        "  /* { backend \"remote\" { */\n"
+        "  # }}}\n"
+        f"  {BACKEND}\n"
+        "}\n"
+    )
+    assert located(locate, text) == BACKEND
+
+
+def test_backend_outside_terraform_block(locate):
+    text = 'resource "x" "y" {\n  backend "remote" {\n  }\n}\nterraform {\n}\n'
+    assert locate(text) is None
+
+
+def test_no_backend(locate):
+    assert locate('terraform {\n  required_version = ">= 1.4"\n}\n') is None
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        'terraform {\n  backend "remote" {\n    organization = "acme"\n',
+        'terraform {\n  backend "remote" {\n    organization = "acme\n  }\n}\n',
+        'terraform {\n  /* backend\n  backend "remote" {}\n}\n',
+        'locals {\n  a = <<EOT\n  backend\n}\nterraform {\n  backend "remote" {}\n}\n',
+    ],
+    ids=["braces", "string", "block-comment", "heredoc"],
+)
+def test_unterminated_input_raises(locate, text):
+    with pytest.raises(ValueError):
+        locate(text)
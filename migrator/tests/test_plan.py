@@ -0,0 +1,121 @@
+"""
+Version 2 migration plans: written by a dry run with --plan-out and executed
+with --apply against benchmarks/mock_tfc.py, without scanning again.
+
+Run from the repository root or migrator/:
+    python3 -m pytest migrator/tests
+"""
+import importlib.util
+import json
+import os
+import sys
+
+import pytest
+
+MIGRATOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _load(name: str, path: str):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def mt(monkeypatch, tmp_path):
+    module = _load("migrate_tfc_plan", os.path.join(MIGRATOR_DIR, "migrate_tfc.py"))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.delenv("TFC_TOKEN", raising=False)
+    # No terraform here; init is recorded instead of run
+    module.inits = []
+    monkeypatch.setattr(module, "_terraform_error", "")
+    monkeypatch.setattr(
+        module, "init_directory", lambda plan, *a: module.inits.append(plan.folder)
+    )
+    monkeypatch.setattr("builtins.input", lambda prompt="": "YES")
+    return module
+
+
+@pytest.fixture
+def tfc():
+    mock = _load("mock_tfc", os.path.join(MIGRATOR_DIR, "benchmarks", "mock_tfc.py"))
+    server = mock.start_mock_server(org="acme", workspaces=1)
+    yield server
+    server.shutdown()
+
+
+def backend_tf(workspaces: str) -> str:
+    return (
+        'terraform {\n  backend "remote" {\n    organization = "acme"\n'
+        f"    workspaces {{\n      {workspaces}\n    }}\n  }}\n}}\n"
+    )
+
+
+@pytest.fixture
+def stacks(tmp_path):
+    folders = {}
+    for name, workspaces in [("app", 'name = "app"'), ("ws-00000", 'prefix = "team-"')]:
+        folder = tmp_path / "stacks" / name
+        folder.mkdir(parents=True)
+        (folder / "main.tf").write_text(backend_tf(workspaces))
+        folders[name] = str(folder)
+    return folders
+
+
+def run(mt, monkeypatch, *argv) -> None:
+    monkeypatch.setattr(sys, "argv", ["migrate_tfc.py", *argv])
+    mt.main()
+
+
+def test_plan_out_then_apply(mt, tfc, stacks, tmp_path, monkeypatch):
+    plan_path = str(tmp_path / "plan.json")
+    originals = {
+        name: open(os.path.join(folder, "main.tf")).read()
+        for name, folder in stacks.items()
+    }
+    run(
+        mt, monkeypatch,
+        "-r", str(tmp_path / "stacks"),
+        "--hostname", tfc.hostname,
+        "--plan-out", plan_path,
+    )
+    for name, folder in stacks.items():
+        assert open(os.path.join(folder, "main.tf")).read() == originals[name]
+
+    with open(plan_path) as f:
+        raw = json.load(f)
+    assert raw["version"] == 2 and raw["hostname"] == tfc.hostname
+    assert [d["folder"] for d in raw["directories"]] == sorted(stacks.values())
+    tagged = raw["directories"][1]
+    assert (tagged["workspace"], tagged["tag"]) == ("ws-00000", "team")
+
+    run(
+        mt, monkeypatch,
+        "--apply", plan_path,
+        "--token", "x",
+        "--api-scheme", "http",
+        "--journal", str(tmp_path / "journal.jsonl"),
+        "--no-plugin-cache",
+    )
+    assert mt.inits == sorted(stacks.values())
+    for folder in stacks.values():
+        content = open(os.path.join(folder, "main.tf")).read()
+        assert 'backend "remote"' not in content
+        assert f'hostname     = "{tfc.hostname}"' in content
+    assert "app" in tfc.state.workspaces
+    assert tfc.state.workspaces["ws-00000"]["tags"] == ["team"]
+
+
+def test_apply_refuses_changed_files(mt, stacks, tmp_path, monkeypatch, capsys):
+    plan_path = str(tmp_path / "plan.json")
+    run(mt, monkeypatch, "-d", stacks["app"], "--plan-out", plan_path)
+    path = os.path.join(stacks["app"], "main.tf")
+    with open(path, "a") as f:
+        f.write("# edited after planning\n")
+
+    with pytest.raises(SystemExit) as exit_info:
+        run(mt, monkeypatch, "--apply", plan_path, "--token", "x")
+    assert exit_info.value.code == 1
+    assert f"{path}: changed since the plan was written" in capsys.readouterr().out
+    assert mt.inits == []
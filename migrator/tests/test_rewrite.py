@@ -0,0 +1,97 @@
+"""
+Planning and writing a directory's rewrite: the cloud block that replaces
+the remote backend, and the files as they end up on disk.
+
+Run from the repository root or migrator/:
+    python3 -m pytest migrator/tests
+"""
+import importlib.util
+import os
+
+import pytest
+
+SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrate_tfc.py"
+)
+
+
+@pytest.fixture(scope="module")
+def mt():
+    spec = importlib.util.spec_from_file_location("migrate_tfc_rewrite", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+BACKEND_TF = '''terraform {
+  required_version = ">= 1.4"
+  backend "remote" {
+    organization = "acme"
+    workspaces {
+      name = "app"
+    }
+  }
+}
+'''
+
+CLOUD_TF = '''terraform {
+  required_version = ">= 1.4"
+  cloud {
+    organization = "acme"
+    workspaces {
+      name = "app"
+    }
+  }
+}
+'''
+
+
+def migrate(mt, folder: str) -> None:
+    plan = mt.plan_directory(folder, mt.DEFAULT_HOSTNAME)
+    assert not any(edit.needs_fmt for edit in plan.edits)
+    mt.rewrite_files(plan, backup=False)
+
+
+def test_lf_file(mt, tmp_path):
+    (tmp_path / "main.tf").write_bytes(BACKEND_TF.encode())
+    migrate(mt, str(tmp_path))
+    assert (tmp_path / "main.tf").read_bytes() == CLOUD_TF.encode()
+
+
+def test_crlf_file_keeps_its_line_endings(mt, tmp_path):
+    (tmp_path / "main.tf").write_bytes(BACKEND_TF.replace("\n", "\r\n").encode())
+    migrate(mt, str(tmp_path))
+    assert (tmp_path / "main.tf").read_bytes() == CLOUD_TF.replace("\n", "\r\n").encode()
+
+
+def test_backends_across_files(mt, tmp_path):
+    (tmp_path / "backend.tf").write_text(BACKEND_TF)
+    (tmp_path / "main.tf").write_text(
+        BACKEND_TF.replace("organization", "# shared\n    organization")
+        + 'resource "null_resource" "x" {}\n'
+    )
+    plan = mt.plan_directory(str(tmp_path), mt.DEFAULT_HOSTNAME)
+    assert [edit.filename for edit in plan.edits] == ["backend.tf", "main.tf"]
+    mt.rewrite_files(plan, backup=False)
+
+    assert (tmp_path / "backend.tf").read_text() == CLOUD_TF
+    assert (tmp_path / "main.tf").read_text() == (
+        'terraform {\n  required_version = ">= 1.4"\n}\n'
+        'resource "null_resource" "x" {}\n'
+    )
+
+
+def test_conflicting_backends_change_nothing(mt, tmp_path):
+    other = BACKEND_TF.replace('name = "app"', 'name = "other"')
+    (tmp_path / "backend.tf").write_text(BACKEND_TF)
+    (tmp_path / "main.tf").write_text(other)
+    with pytest.raises(mt.BackendConflictError, match="backend.tf .*main.tf"):
+        mt.plan_directory(str(tmp_path), mt.DEFAULT_HOSTNAME)
+
+    result = mt.migrate_directory(
+        str(tmp_path), None, mt.DEFAULT_HOSTNAME, dry_run=False, backup=False
+    )
+    assert result is None
+    assert (tmp_path / "backend.tf").read_text() == BACKEND_TF
+    assert (tmp_path / "main.tf").read_text() == other
+    assert sorted(os.listdir(tmp_path)) == ["backend.tf", "main.tf"]